@@ -0,0 +1,87 @@
+# ai/bench_windowing.py
+#
+# Compara la construcción de ventanas del paso 4 de train_full_corpus.py:
+# bucle con np.hstack por índice (anterior) frente a vistas con strides
+# (windowing.make_windows), sobre el corpus completo. Mide tiempo, memoria
+# pico (tracemalloc) y comprueba que X / y son idénticos.
+#
+#   python ai/bench_windowing.py [carpeta]
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from extract_cache import ExtractCache
+from ingest import ingest_folder
+from process_midi import process_midi_file
+from windowing import make_windows, stack_columns
+
+BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, "datasets", "corpus")
+SEQ_LEN    = 16
+
+# —————————————————————————————————————————————————————————————————————————
+def windows_with_loop(n_s, d_s, v_s):
+    """
+    Construcción original: un np.hstack por índice y copia final a X.
+    """
+    X, y = [], []
+    for i in range(len(n_s) - SEQ_LEN):
+        seq = np.hstack((
+            n_s[i    : i+SEQ_LEN],
+            d_s[i    : i+SEQ_LEN],
+            v_s[i    : i+SEQ_LEN],
+        ))
+        X.append(seq)
+        y.append([
+            n_s[i+SEQ_LEN,0],
+            d_s[i+SEQ_LEN,0],
+            v_s[i+SEQ_LEN,0],
+        ])
+    return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32)
+
+def windows_with_views(n_s, d_s, v_s):
+    return make_windows(stack_columns(n_s, d_s, v_s), SEQ_LEN)
+
+def bench(fn, columns):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    X, y = fn(*columns)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, X, y
+
+def load_corpus(folder):
+    mels = []
+    cache = ExtractCache("corpus", process_midi_file)
+    for _, m in ingest_folder(folder, extractor=process_midi_file, cache=cache, verbose=False):
+        mels.extend(m)
+    columns = []
+    for key in ("note", "duration", "velocity"):
+        values = np.array([m[key] for m in mels]).reshape(-1,1).astype(float)
+        columns.append(MinMaxScaler().fit(values).transform(values))
+    return columns
+
+if __name__ == "__main__":
+    folder  = sys.argv[1] if len(sys.argv) > 1 else CORPUS_DIR
+    columns = load_corpus(folder)
+    print(f"🎵 {len(columns[0])} eventos, ventanas de {SEQ_LEN}×3")
+
+    t_old, m_old, X_old, y_old = bench(windows_with_loop,  columns)
+    t_new, m_new, X_new, y_new = bench(windows_with_views, columns)
+    # Lo que recibe model.fit tras el muestreo: la copia de las filas elegidas
+    idx = np.random.default_rng(0).choice(len(X_new), min(20000, len(X_new)), replace=False)
+    t0 = time.perf_counter()
+    sample = X_new[idx]
+    t_sample = time.perf_counter() - t0
+
+    print(f"{'':>10} {'tiempo (s)':>11} {'memoria (MB)':>13}")
+    print(f"{'hstack':>10} {t_old:>11.4f} {m_old / 2**20:>13.1f}")
+    print(f"{'vistas':>10} {t_new:>11.4f} {m_new / 2**20:>13.1f}")
+    print(f"speedup {t_old / t_new:.0f}x · muestra de {len(sample)} copiada en {t_sample:.4f}s")
+    print(f"idéntico: X {np.array_equal(X_old, X_new)}, y {np.array_equal(y_old, y_new)}")
@@ -0,0 +1,116 @@
+# ai/extract_cache.py
+
+import hashlib
+import inspect
+import os
+import tempfile
+
+import numpy as np
+
+# —————————————————————————————————————————————————————————————————————————
+# Caché en disco de la extracción de eventos (note, duration, velocity) por
+# archivo MIDI. La clave es el hash del contenido del archivo junto con la
+# versión del extractor, así que solo se vuelven a leer con mido los
+# archivos nuevos o modificados. Cada entrada es un .npy int32 (n, 3).
+
+BASE_DIR          = os.path.dirname(os.path.abspath(__file__))
+EXTRACT_CACHE_DIR = os.environ.get("EXTRACT_CACHE_DIR", os.path.join(BASE_DIR, ".extract_cache"))
+
+# Subir este número invalida todas las entradas (cambio de formato)
+EXTRACTOR_VERSION = 1
+
+FIELDS = ("note", "duration", "velocity")
+
+def extractor_version(extractor) -> str:
+    """
+    Versión del extractor: la del formato más el hash de su código fuente,
+    de modo que cualquier cambio en la función invalida sus entradas.
+    """
+    try:
+        source = inspect.getsource(extractor)
+    except (OSError, TypeError):
+        source = f"{extractor.__module__}.{extractor.__qualname__}"
+    digest = hashlib.sha256(source.encode()).hexdigest()[:12]
+    return f"v{EXTRACTOR_VERSION}-{digest}"
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def events_to_array(mels) -> np.ndarray:
+    return np.array([[m[k] for k in FIELDS] for m in mels], dtype=np.int32).reshape(-1, 3)
+
+def array_to_events(arr: np.ndarray) -> list:
+    return [dict(zip(FIELDS, row)) for row in arr.tolist()]
+
+class ExtractCache:
+    """
+    Un espacio de nombres por conjunto de datos (p. ej. 'corpus', 'sad'):
+    evict() solo borra entradas de su propio espacio.
+    Los archivos que fallaron se recuerdan con un .err para no reintentar
+    el parseo mientras no cambien.
+    """
+    def __init__(self, namespace: str, extractor, root: str = EXTRACT_CACHE_DIR):
+        self.dir     = os.path.join(root, namespace)
+        self.version = extractor_version(extractor)
+        self.hits    = 0
+        self.misses  = 0
+        os.makedirs(self.dir, exist_ok=True)
+
+    def key(self, path: str) -> str:
+        return f"{file_digest(path)}-{self.version}"
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.dir, key + ext)
+
+    def get(self, key: str):
+        """
+        (True, eventos, error) si está en caché; (False, None, None) si no.
+        """
+        try:
+            arr = np.load(self._path(key, ".npy"), allow_pickle=False)
+            self.hits += 1
+            return True, array_to_events(arr), None
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self._path(key, ".err"), encoding="utf-8") as f:
+                self.hits += 1
+                return True, None, f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None, None
+
+    def _atomic_write(self, key: str, ext: str, write):
+        fd, tmp = tempfile.mkstemp(dir=self.dir, prefix="tmp_", suffix=ext)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, self._path(key, ext))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def put(self, key: str, mels, error=None):
+        if error is not None:
+            self._atomic_write(key, ".err", lambda f: f.write(str(error).encode("utf-8")))
+        else:
+            arr = events_to_array(mels or [])
+            self._atomic_write(key, ".npy", lambda f: np.save(f, arr, allow_pickle=False))
+
+    def evict(self, keep_keys) -> int:
+        """
+        Borra las entradas que no corresponden a ningún archivo actual
+        (archivos eliminados, modificados o de otra versión del extractor).
+        """
+        keep = set(keep_keys)
+        removed = 0
+        for name in os.listdir(self.dir):
+            key, _ = os.path.splitext(name)
+            if key not in keep:
+                os.remove(os.path.join(self.dir, name))
+                removed += 1
+        return removed
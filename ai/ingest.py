@@ -0,0 +1,107 @@
+# ai/ingest.py
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from extract_cache import ExtractCache
+
+# —————————————————————————————————————————————————————————————————————————
+# Ingesta en paralelo de carpetas de MIDIs: cada archivo se procesa con
+# process_midi_file en un pool de procesos. El resultado mantiene el orden
+# de los archivos (alfabético) sea cual sea el orden en que terminan.
+# Con una ExtractCache solo se parsean los archivos nuevos o modificados.
+
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+
+def _default_extractor():
+    from process_midi import process_midi_file  # función de extracción de melodías
+    return process_midi_file
+
+def _extract(extractor, path):
+    start = time.perf_counter()
+    try:
+        mels, error = extractor(path), None
+    except Exception as e:
+        mels, error = None, e
+    return mels, error, time.perf_counter() - start
+
+def list_midi_files(folder):
+    return sorted(
+        os.path.join(folder, fn) for fn in os.listdir(folder)
+        if fn.lower().endswith(".mid")
+    )
+
+def _run_extractor(extractor, paths, workers):
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            # chunksize reparte varios archivos por envío y reduce el IPC
+            chunksize = max(1, len(paths) // (workers * 8))
+            return list(ex.map(_extract, repeat(extractor), paths, chunksize=chunksize))
+    return [_extract(extractor, p) for p in paths]
+
+def ingest_files(paths, workers=INGEST_WORKERS, verbose=True, extractor=None, cache=None):
+    """
+    Devuelve [(path, eventos)] en el orden de `paths`, saltando los archivos
+    corruptos o sin notas (se avisa igual que antes).
+    `cache` es una ExtractCache: las entradas de archivos que ya no están
+    en `paths` se eliminan al terminar.
+    """
+    extractor = extractor or _default_extractor()
+    start = time.perf_counter()
+
+    results, keys, pending = [None] * len(paths), [], []
+    for i, path in enumerate(paths):
+        if cache is None:
+            pending.append(i)
+            continue
+        key = cache.key(path)
+        keys.append(key)
+        found, mels, error = cache.get(key)
+        if found:
+            results[i] = (mels, error, 0.0)
+        else:
+            pending.append(i)
+
+    fresh = _run_extractor(extractor, [paths[i] for i in pending], workers)
+    for i, (mels, error, seconds) in zip(pending, fresh):
+        results[i] = (mels, error, seconds)
+        if cache is not None:
+            cache.put(keys[i], mels, error)
+
+    extracted = []
+    for path, (mels, error, seconds) in zip(paths, results):
+        fn = os.path.basename(path)
+        if error is not None:
+            print(f"⚠️ {fn}: no es MIDI válido o error → {error}. Se ignora.")
+        elif not mels:
+            print(f"⚠️ {fn}: no extrajo notas (vacío), se ignora.")
+        else:
+            extracted.append((path, mels))
+            if verbose:
+                origin = f"{seconds:.3f}s" if seconds else "caché"
+                print(f"   {fn}: {len(mels)} eventos ({origin})")
+
+    elapsed = time.perf_counter() - start
+    rate = len(paths) / elapsed if elapsed > 0 else float("inf")
+    summary = (f"⏱️ {len(paths)} archivos en {elapsed:.2f}s con {workers} procesos "
+               f"({rate:.1f} archivos/s, {len(extracted)} válidos")
+    if cache is not None:
+        evicted = cache.evict(keys)
+        summary += f", {len(paths) - len(pending)} desde caché, {evicted} entradas eliminadas"
+    print(summary + ")")
+    return extracted
+
+def ingest_folder(folder, workers=INGEST_WORKERS, verbose=True, extractor=None, cache=None):
+    return ingest_files(list_midi_files(folder), workers, verbose, extractor, cache)
+
+if __name__ == "__main__":
+    # python ai/ingest.py [carpeta] [procesos]
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    folder   = sys.argv[1] if len(sys.argv) > 1 else os.path.join(BASE_DIR, "datasets", "corpus")
+    workers  = int(sys.argv[2]) if len(sys.argv) > 2 else INGEST_WORKERS
+    extractor = _default_extractor()
+    ingest_folder(folder, workers, extractor=extractor,
+                  cache=ExtractCache(os.path.basename(os.path.normpath(folder)), extractor))
@@ -0,0 +1,189 @@
+# ai/melody_dataset.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+# —————————————————————————————————————————————————————————————————————————
+# Formato columnar de los conjuntos de melodías (sustituye a los
+# *_midi_data.json). Un conjunto es un directorio <nombre>.cols con:
+#   note.npy (int16), duration.npy (int32), velocity.npy (int16)
+#   offsets.npy (int64): los eventos de scales[i] son [offsets[i], offsets[i+1])
+#   meta.json: versión, escalas y número de eventos
+# Las columnas se abren con memoria mapeada: cargar un conjunto no lee los
+# eventos hasta que se usan.
+# Este módulo solo depende de NumPy: lo usan tanto los scripts de ai/ como
+# el backend (from ai.melody_dataset import ...).
+
+FORMAT_VERSION = 1
+SUFFIX         = ".cols"
+
+COLUMNS = {
+    "note":     np.int16,
+    "duration": np.int32,
+    "velocity": np.int16,
+}
+FIELDS = tuple(COLUMNS)
+
+def _as_rows(mels) -> np.ndarray:
+    # Lista de dicts {'note', 'duration', 'velocity'} o array (n, 3)
+    if isinstance(mels, np.ndarray):
+        return mels.reshape(-1, 3).astype(np.int64)
+    return np.array([[m[k] for k in FIELDS] for m in mels], dtype=np.int64).reshape(-1, 3)
+
+class MelodyDataset:
+    """
+    Eventos (note, duration, velocity) agrupados por escala de origen,
+    guardados como tres columnas contiguas.
+    """
+    def __init__(self, scales, offsets, note, duration, velocity):
+        self.scales   = list(scales)
+        self.offsets  = np.asarray(offsets, dtype=np.int64)
+        self.note     = note
+        self.duration = duration
+        self.velocity = velocity
+        if len(self.offsets) != len(self.scales) + 1:
+            raise ValueError("offsets debe tener una entrada más que scales")
+        if not (len(note) == len(duration) == len(velocity) == self.offsets[-1]):
+            raise ValueError("Las columnas no coinciden con los offsets")
+
+    # ——— Construcción ———
+    @classmethod
+    def from_blocks(cls, blocks: dict):
+        """
+        blocks: {escala: eventos} en el orden en que se guardarán.
+        """
+        scales, arrays = [], []
+        for scale, mels in blocks.items():
+            scales.append(scale)
+            arrays.append(_as_rows(mels))
+        rows = np.concatenate(arrays) if arrays else np.empty((0, 3), dtype=np.int64)
+        for (name, dtype), col in zip(COLUMNS.items(), rows.T):
+            info = np.iinfo(dtype)
+            if col.size and (col.min() < info.min or col.max() > info.max):
+                raise ValueError(f"La columna {name} no cabe en {np.dtype(dtype).name}")
+        offsets = np.concatenate(([0], np.cumsum([len(a) for a in arrays], dtype=np.int64)))
+        columns = [rows[:, i].astype(dtype) for i, dtype in enumerate(COLUMNS.values())]
+        return cls(scales, offsets, *columns)
+
+    @classmethod
+    def from_json_dict(cls, data: dict):
+        # Estructura de los antiguos *_midi_data.json: {escala: {'melodias': [...]}}
+        return cls.from_blocks({scale: block.get("melodias", []) for scale, block in data.items()})
+
+    @classmethod
+    def from_json(cls, path: str):
+        with open(path, "r") as f:
+            return cls.from_json_dict(json.load(f))
+
+    # ——— Lectura / escritura ———
+    @classmethod
+    def open(cls, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Versión de conjunto no soportada: {meta.get('version')}")
+        mode = "r" if mmap else None
+        columns = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode, allow_pickle=False)
+                   for name in COLUMNS]
+        offsets = np.load(os.path.join(path, "offsets.npy"), allow_pickle=False)
+        return cls(meta["scales"], offsets, *columns)
+
+    def save(self, path: str) -> str:
+        """
+        Escribe el conjunto en un directorio temporal y lo coloca en `path`
+        con os.replace, así un lector nunca ve un conjunto a medias.
+        """
+        path   = os.path.normpath(path)
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, prefix="tmp_")
+        os.chmod(tmp, 0o755)  # mkdtemp lo crea solo para el propietario
+        try:
+            for name, dtype in COLUMNS.items():
+                np.save(os.path.join(tmp, f"{name}.npy"),
+                        np.ascontiguousarray(getattr(self, name), dtype=dtype), allow_pickle=False)
+            np.save(os.path.join(tmp, "offsets.npy"), self.offsets, allow_pickle=False)
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump({"version": FORMAT_VERSION, "scales": self.scales,
+                           "events": len(self),
+                           "columns": {k: np.dtype(v).name for k, v in COLUMNS.items()}}, f, indent=2)
+            old = None
+            if os.path.isdir(path):
+                old = tempfile.mkdtemp(dir=parent, prefix="tmp_")
+                os.replace(path, os.path.join(old, "prev"))
+            os.replace(tmp, path)
+            if old:
+                shutil.rmtree(old)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return path
+
+    # ——— Acceso ———
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def span(self, scale: str):
+        i = self.scales.index(scale)
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def events(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Eventos [start, stop) como un array int32 (n, 3) (copia).
+        """
+        stop = len(self) if stop is None else stop
+        out = np.empty((stop - start, 3), dtype=np.int32)
+        for i, name in enumerate(COLUMNS):
+            out[:, i] = getattr(self, name)[start:stop]
+        return out
+
+    def to_json_dict(self) -> dict:
+        data = {}
+        for i, scale in enumerate(self.scales):
+            rows = self.events(int(self.offsets[i]), int(self.offsets[i + 1])).tolist()
+            data[scale] = {"melodias": [dict(zip(FIELDS, r)) for r in rows]}
+        return data
+
+def dataset_path(json_path: str) -> str:
+    # sad_midi_data.json -> sad_midi_data.cols
+    return os.path.splitext(json_path)[0] + SUFFIX
+
+def load(path: str, mmap: bool = True) -> MelodyDataset:
+    """
+    Abre un conjunto columnar; acepta también un .json antiguo (se convierte
+    en memoria).
+    """
+    if path.endswith(".json"):
+        return MelodyDataset.from_json(path)
+    return MelodyDataset.open(path, mmap=mmap)
+
+def convert_json(json_path: str, out_path: str = None) -> str:
+    out_path = out_path or dataset_path(json_path)
+    ds = MelodyDataset.from_json(json_path)
+    ds.save(out_path)
+    # El conjunto guardado debe devolver exactamente los mismos eventos
+    with open(json_path, "r") as f:
+        original = json.load(f)
+    expected = {s: {"melodias": b.get("melodias", [])} for s, b in original.items()}
+    if load(out_path).to_json_dict() != expected:
+        raise ValueError(f"La conversión de {json_path} no es exacta")
+    return out_path
+
+if __name__ == "__main__":
+    # python ai/melody_dataset.py sad_midi_data.json [happy_midi_data.json ...]
+    if len(sys.argv) < 2:
+        print("Uso: python ai/melody_dataset.py <archivo.json> [...]")
+        sys.exit(1)
+    for json_path in sys.argv[1:]:
+        before = os.path.getsize(json_path)
+        out = convert_json(json_path)
+        after = sum(os.path.getsize(os.path.join(out, n)) for n in os.listdir(out))
+        print(f"✅ {json_path} → {out} ({len(load(out))} eventos, {before} → {after} bytes)")
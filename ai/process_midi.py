@@ -2,9 +2,12 @@
 
 import mido
 import os
-import json
 from collections import defaultdict
 
+from extract_cache import ExtractCache
+from melody_dataset import MelodyDataset
+from ingest import ingest_files
+
 # Definición de escalas (solo menores por ahora)
 SCALES = {
     "AMINOR": ["A", "B", "C", "D", "E", "F", "G"],
@@ -59,8 +62,8 @@ def process_midi_file(midi_path):
     return melody
 
 # Función para procesar toda la carpeta de melodías
-def process_midi_folder(folder_path, output_json="midi_data.json"):
-    data = defaultdict(lambda: {"melodias": []})
+def process_midi_folder(folder_path, output_path="midi_data.cols"):
+    data = defaultdict(list)
     subpath = os.path.join(folder_path, "melody")
 
     print(f"Buscando archivos en: {subpath}")
@@ -68,26 +71,33 @@ def process_midi_folder(folder_path, output_json="midi_data.json"):
         print(f"❌ No existe la carpeta: {subpath}")
         return
 
-    for file in os.listdir(subpath):
+    # Archivos con escala reconocida, en orden alfabético
+    paths, scales = [], []
+    for file in sorted(os.listdir(subpath)):
         if file.endswith(".mid"):
             midi_path = os.path.join(subpath, file)
-            print(f"Procesando archivo: {midi_path}")
             scale = get_scale_from_filename(file)
             if scale and scale in SCALES:
-                print(f"Escala detectada: {scale} - Melodía")
-                processed_data = process_midi_file(midi_path)
-                data[scale]["melodias"].extend(processed_data)
+                print(f"Escala detectada: {scale} - Melodía ({file})")
+                paths.append(midi_path)
+                scales.append(scale)
             else:
                 print(f"⚠️ Escala no reconocida o archivo mal nombrado: {file}")
 
-    with open(output_json, "w") as f:
-        json.dump(data, f, indent=4)
+    # Extracción en paralelo; la caché evita volver a parsear lo que no cambió
+    cache = ExtractCache(os.path.basename(os.path.normpath(folder_path)), process_midi_file)
+    extracted = dict(ingest_files(paths, extractor=process_midi_file, cache=cache))
+    for midi_path, scale in zip(paths, scales):
+        data[scale].extend(extracted.get(midi_path, []))
+
+    # Conjunto columnar (ver melody_dataset.py), una fila por evento
+    MelodyDataset.from_blocks(data).save(output_path)
 
-    print(f"✅ Datos procesados y guardados en {output_json}")
+    print(f"✅ Datos procesados y guardados en {output_path}")
 
 if __name__ == "__main__":
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     midi_folder = os.path.join(BASE_DIR, "datasets", "midi", "sad")
 
     print(f"📂 Ruta del dataset: {midi_folder}")
-    process_midi_folder(midi_folder, "sad_midi_data.json")
+    process_midi_folder(midi_folder, os.path.join(BASE_DIR, "sad_midi_data.cols"))
@@ -1,6 +1,6 @@
 # ai/train_melody_classifier.py
 
-import os, json, pickle
+import os, pickle
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
@@ -8,8 +8,11 @@ from tensorflow.keras.layers import LSTM, Dropout, Dense
 from tensorflow.keras.optimizers import Adam
 from sklearn.preprocessing import MinMaxScaler
 
+from melody_dataset import load
+from transpose_augment import TransposedWindows, fit_note_scaler, AUG_POLICY, AUG_SEED
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SAD_JSON      = os.path.join(BASE_DIR, "sad_midi_data_augmented.json")
+SAD_DATA      = os.path.join(BASE_DIR, "sad_midi_data.cols")
 FULL_WEIGHTS  = os.path.join(BASE_DIR, "full_melody.h5")
 NOTE_SCL_PKL  = os.path.join(BASE_DIR, "note_scaler.pkl")
 DUR_SCL_PKL   = os.path.join(BASE_DIR, "duration_scaler.pkl")
@@ -17,20 +20,18 @@ VEL_SCL_PKL   = os.path.join(BASE_DIR, "velocity_scaler.pkl")
 OUTPUT_MODEL  = os.path.join(BASE_DIR, "melody_model.h5")
 
 def load_sad_mels():
-    with open(SAD_JSON, "r") as f: raw = json.load(f)
-    mels = []
-    for block in raw.values():
-        for m in block["melodias"]:
-            mels.append((m["note"], m["duration"], m["velocity"]))
-    print(f"🎯 Cargando {len(mels)} eventos de sad_midi_data_augmented.json")
+    # Array (n, 3) de eventos (note, duration, velocity)
+    mels = load(SAD_DATA).events()
+    print(f"🎯 Cargando {len(mels)} eventos de sad_midi_data.cols")
     return mels
 
 def preprocess(melodies):
-    notes = np.array([m[0] for m in melodies]).reshape(-1,1).astype(float)
-    durs  = np.array([m[1] for m in melodies]).reshape(-1,1).astype(float)
-    vels  = np.array([m[2] for m in melodies]).reshape(-1,1).astype(float)
+    notes = melodies[:, 0].reshape(-1,1).astype(float)
+    durs  = melodies[:, 1].reshape(-1,1).astype(float)
+    vels  = melodies[:, 2].reshape(-1,1).astype(float)
 
-    note_scl     = MinMaxScaler().fit(notes)
+    # La nota se ajusta al rango de las 12 transposiciones que se aplican al vuelo
+    note_scl     = fit_note_scaler(notes)
     dur_scl      = MinMaxScaler().fit(durs)
     vel_scl      = MinMaxScaler().fit(vels)
 
@@ -39,21 +40,13 @@ def preprocess(melodies):
     with open(DUR_SCL_PKL, "wb") as f: pickle.dump(dur_scl,  f)
     with open(VEL_SCL_PKL, "wb") as f: pickle.dump(vel_scl,  f)
 
-    n_s = note_scl.transform(notes)
-    d_s = dur_scl.transform(durs)
-    v_s = vel_scl.transform(vels)
-
     SEQ_LEN = 16
-    X, y = [], []
-    for i in range(len(n_s)-SEQ_LEN):
-        seq = np.hstack((n_s[i:i+SEQ_LEN], d_s[i:i+SEQ_LEN], v_s[i:i+SEQ_LEN]))
-        X.append(seq)
-        y.append([n_s[i+SEQ_LEN,0], d_s[i+SEQ_LEN,0], v_s[i+SEQ_LEN,0]])
-
-    X = np.array(X, dtype=np.float32)
-    y = np.array(y, dtype=np.float32)
-    print("🔢 Fine-tune secuencias:", X.shape, y.shape)
-    return X, y
+    train_seq, val_seq = TransposedWindows.split(
+        melodies, (note_scl, dur_scl, vel_scl), validation_split=0.2,
+        seq_len=SEQ_LEN, batch_size=32, policy=AUG_POLICY, seed=AUG_SEED)
+    print(f"🔢 Fine-tune secuencias ({AUG_POLICY}, seed {AUG_SEED}):",
+          train_seq.samples, "por época,", val_seq.samples, "de validación")
+    return train_seq, val_seq
 
 def build_model(input_shape):
     m = Sequential([
@@ -69,17 +62,18 @@ def build_model(input_shape):
 
 def train():
     mels = load_sad_mels()
-    X, y = preprocess(mels)
-    if X.shape[0] < 10:
+    train_seq, val_seq = preprocess(mels)
+    if train_seq.samples + val_seq.samples < 10:
         print("⚠️ Pocos datos, no entreno.")
         return
 
-    model = build_model((X.shape[1], X.shape[2]))
+    tf.keras.utils.set_random_seed(AUG_SEED)
+    model = build_model((train_seq.seq_len, 3))
     print("🔄 Cargando pesos genéricos…")
     model.load_weights(FULL_WEIGHTS)
 
     print("🚀 Fine-tuning modelo en ‘sad’…")
-    model.fit(X, y, epochs=50, batch_size=32, validation_split=0.2, shuffle=True)
+    model.fit(train_seq, validation_data=val_seq, epochs=50)
     model.save(OUTPUT_MODEL)
     print("✅ Modelo fine-tuneado guardado en", OUTPUT_MODEL)
 
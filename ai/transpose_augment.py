@@ -0,0 +1,159 @@
+# ai/transpose_augment.py
+
+import os
+
+import numpy as np
+import tensorflow as tf
+from sklearn.preprocessing import MinMaxScaler
+
+from windowing import window_view
+
+# —————————————————————————————————————————————————————————————————————————
+# Aumento por transposición dentro del pipeline de entrenamiento: en lugar
+# de guardar las 12 transposiciones en disco, cada lote toma ventanas de
+# los eventos originales y las transpone al vuelo (la ventana entera y su
+# objetivo con el mismo desplazamiento, (nota + shift) % 128).
+#   exhaustive: cada época recorre todos los pares (ventana, desplazamiento):
+#               las mismas ventanas que transponer la secuencia entera a
+#               cada desplazamiento y cortarla, en otro orden. No reproduce
+#               el antiguo *_augmented.json, que intercalaba los 12
+#               desplazamientos evento a evento (sus ventanas mezclaban
+#               transposiciones).
+#   random:     cada época recorre todas las ventanas una vez, cada una con
+#               un desplazamiento al azar (12 veces menos pasos por época)
+# El orden y los desplazamientos de cada época salen de (seed, época), así
+# que con la misma seed los lotes son idénticos.
+
+SHIFTS   = tuple(range(12))
+POLICIES = ("random", "exhaustive")
+
+AUG_POLICY = os.environ.get("AUG_POLICY", "exhaustive")
+AUG_SEED   = int(os.environ.get("AUG_SEED", "0"))
+
+def transpose_notes(notes, shifts):
+    return (notes + shifts) % 128
+
+def fit_note_scaler(notes, shifts=SHIFTS) -> MinMaxScaler:
+    """
+    MinMaxScaler de notas ajustado al rango de todas las transposiciones,
+    igual que si se ajustara sobre el conjunto aumentado completo.
+    """
+    unique = np.unique(np.asarray(notes, dtype=np.int64))
+    transposed = transpose_notes(unique[:, None], np.asarray(shifts)[None, :])
+    return MinMaxScaler().fit(np.array([[transposed.min()], [transposed.max()]], dtype=float))
+
+class TransposedWindows(tf.keras.utils.Sequence):
+    """
+    Lotes (X, y) para model.fit: X (b, seq_len, 3) e y (b, 3), escalados
+    con los scalers de nota, duración y velocidad.
+    `windows` son los índices de inicio de ventana que usa esta secuencia
+    (permite separar entrenamiento y validación sobre los mismos eventos).
+    """
+    def __init__(self, events, scalers, seq_len=16, batch_size=32, policy=AUG_POLICY,
+                 seed=AUG_SEED, shuffle=True, windows=None, shifts=SHIFTS):
+        super().__init__()
+        if policy not in POLICIES:
+            raise ValueError(f"Política de transposición desconocida: {policy}")
+        self.events     = np.asarray(events, dtype=np.int64).reshape(-1, 3)
+        self.scalers    = scalers
+        self.seq_len    = seq_len
+        self.batch_size = batch_size
+        self.policy     = policy
+        self.seed       = seed
+        self.shuffle    = shuffle
+        self.shifts     = np.asarray(shifts, dtype=np.int64)
+        self.windows    = (np.arange(max(0, len(self.events) - seq_len)) if windows is None
+                           else np.asarray(windows, dtype=np.int64))
+        # Vista (ventana + objetivo) sobre los eventos; solo se copia al indexar
+        self._view      = window_view(self.events, seq_len + 1)
+        self.epoch      = 0
+        self._plan()
+
+    @property
+    def samples(self) -> int:
+        # Ejemplos por época
+        per_window = len(self.shifts) if self.policy == "exhaustive" else 1
+        return len(self.windows) * per_window
+
+    def _plan(self):
+        # Orden de las ventanas y desplazamiento de cada ejemplo de la época
+        rng = np.random.default_rng([self.seed, self.epoch])
+        if self.policy == "exhaustive":
+            pairs = np.arange(self.samples)
+            if self.shuffle:
+                pairs = rng.permutation(pairs)
+            self._starts = self.windows[pairs // len(self.shifts)]
+            self._shift  = self.shifts[pairs % len(self.shifts)]
+        else:
+            order = rng.permutation(len(self.windows)) if self.shuffle else np.arange(len(self.windows))
+            self._starts = self.windows[order]
+            self._shift  = rng.choice(self.shifts, size=len(order))
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self._plan()
+
+    def __len__(self) -> int:
+        return -(-self.samples // self.batch_size)
+
+    def __getitem__(self, i):
+        sl     = slice(i * self.batch_size, (i + 1) * self.batch_size)
+        starts = self._starts[sl]
+        # (b, seq_len + 1, 3): la ventana y su evento objetivo
+        block  = self._view[starts]
+        notes  = transpose_notes(block[:, :, 0], self._shift[sl, None])
+
+        scaled = np.empty(block.shape, dtype=np.float32)
+        for col, (values, scaler) in enumerate(zip((notes, block[:, :, 1], block[:, :, 2]), self.scalers)):
+            scaled[:, :, col] = scaler.transform(values.reshape(-1, 1).astype(float)).reshape(values.shape)
+        return scaled[:, :self.seq_len], scaled[:, self.seq_len]
+
+    @classmethod
+    def split(cls, events, scalers, validation_split=0.2, **kwargs):
+        """
+        (entrenamiento, validación): la validación son las últimas ventanas,
+        como hacía validation_split, recorridas en orden y con todas las
+        transposiciones.
+        """
+        seq_len = kwargs.get("seq_len", 16)
+        windows = np.arange(max(0, len(events) - seq_len))
+        cut     = int(len(windows) * (1 - validation_split))
+        train   = cls(events, scalers, windows=windows[:cut], **kwargs)
+        kwargs.update(policy="exhaustive", shuffle=False)
+        val     = cls(events, scalers, windows=windows[cut:], **kwargs)
+        return train, val
+
+if __name__ == "__main__":
+    # Comprobación: una época 'exhaustive' da el mismo multiconjunto de
+    # ventanas que transponer la secuencia entera a cada desplazamiento y
+    # cortarla (el orden es otro; se comparan ordenadas), y la misma seed
+    # produce los mismos lotes.
+    rng    = np.random.default_rng(0)
+    events = np.stack([rng.integers(40, 90, 300), rng.integers(1, 960, 300),
+                       rng.integers(30, 127, 300)], axis=1)
+    scalers = (fit_note_scaler(events[:, 0]),
+               MinMaxScaler().fit(events[:, 1:2].astype(float)),
+               MinMaxScaler().fit(events[:, 2:3].astype(float)))
+
+    expected = []
+    for s in SHIFTS:
+        shifted = events.copy()
+        shifted[:, 0] = transpose_notes(shifted[:, 0], s)
+        n, d, v = (sc.transform(shifted[:, c:c + 1].astype(float)) for c, sc in enumerate(scalers))
+        for i in range(len(events) - 16):
+            expected.append(np.vstack((np.hstack((n[i:i+16], d[i:i+16], v[i:i+16])),
+                                       [[n[i+16, 0], d[i+16, 0], v[i+16, 0]]])).astype(np.float32))
+
+    seq = TransposedWindows(events, scalers, batch_size=64, policy="exhaustive", seed=7)
+    got = [np.vstack((x, t[None])) for b in range(len(seq)) for x, t in zip(*seq[b])]
+    key = lambda a: a.tobytes()
+    assert sorted(map(key, got)) == sorted(map(key, expected)), "el multiconjunto de ventanas no coincide"
+
+    for policy in POLICIES:
+        a, b = (TransposedWindows(events, scalers, policy=policy, seed=3) for _ in range(2))
+        for _ in range(2):
+            assert all(np.array_equal(a[i][0], b[i][0]) for i in range(len(a)))
+            a.on_epoch_end()
+            b.on_epoch_end()
+    print(f"✅ {len(expected)} ventanas aumentadas: mismo multiconjunto, otro orden; "
+          f"lotes reproducibles con la misma seed")
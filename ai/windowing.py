@@ -0,0 +1,36 @@
+# ai/windowing.py
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# —————————————————————————————————————————————————————————————————————————
+# Ventanas deslizantes para el entrenamiento como vistas con strides sobre
+# el array de eventos: no se copia nada hasta que se indexan o se pasan al
+# modelo. Sustituye al bucle con np.hstack por índice de los scripts de
+# entrenamiento y da exactamente los mismos X / y.
+
+def window_view(events: np.ndarray, length: int) -> np.ndarray:
+    """
+    Vista (n - length + 1, length, k) de events (n, k): fila i = events[i:i+length].
+    """
+    events = np.asarray(events)
+    if len(events) < length:
+        return np.empty((0, length) + events.shape[1:], dtype=events.dtype)
+    # sliding_window_view pone la ventana en el último eje: (n', k, length)
+    return np.moveaxis(sliding_window_view(events, length, axis=0), -1, 1)
+
+def make_windows(events: np.ndarray, seq_len: int):
+    """
+    (X, y) con X[i] = events[i:i+seq_len] e y[i] = events[i+seq_len],
+    para i en range(len(events) - seq_len). Ambos son vistas de events.
+    """
+    events = np.asarray(events)
+    n = max(0, len(events) - seq_len)
+    return window_view(events, seq_len)[:n], events[seq_len:seq_len + n]
+
+def stack_columns(*columns, dtype=np.float32) -> np.ndarray:
+    """
+    Une columnas (n, 1) (nota, duración, velocidad ya escaladas) en un
+    único array (n, k) del tipo final de X / y: la única copia necesaria.
+    """
+    return np.hstack(columns).astype(dtype, copy=False)
@@ -1,25 +1,70 @@
 # app.py
 
-from fastapi import FastAPI, Depends, HTTPException, Form, UploadFile, File, Request
+from fastapi import (
+    FastAPI, Depends, HTTPException, Form, Request, BackgroundTasks
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import base64
+import io
+import json
 import os
 import sqlite3
-import shutil
+import tempfile
 import uuid
+import zipfile
 from jose import JWTError, jwt
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
 
-from backend.generate_music import generate_music
+from backend.generate_music import (
+    generate_music, generate_music_batch, iter_music_events, pipelines_report,
+    model_version, SCALE_DEGREES
+)
+from backend.worker_pool import pool, QueueFull, DeadlineExceeded
+from backend.batching import batcher
+from backend.result_cache import result_cache, cache_key
+from backend.melody_reserve import reserve
+from backend.db import get_connection, transaction, writer
+from backend import catalog
+from backend.melody_store import store, STORE_GC_INTERVAL_S
+from backend.midi_validator import MidiStreamValidator, InvalidMidi, MidiTooLarge
 from backend.auth import (
     init_db, hash_password, verify_password, create_access_token,
-    get_current_user, DB_PATH, SECRET_KEY, ALGORITHM
+    get_current_user, SECRET_KEY, ALGORITHM
 )
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los procesos del pool cargan los modelos una sola vez al arrancar
+    pool.start()
+    writer.start()
+    # Subidas anteriores al catálogo (solo las que falten)
+    catalog.backfill(UPLOAD_DIR)
+    # Melodías del directorio plano → almacén por contenido (solo la primera vez)
+    store.import_legacy()
+    gc_task = asyncio.create_task(recolector_almacen())
+    # Reserva de melodías pregeneradas, rellenada con el pool ocioso
+    reserve.start()
+    yield
+    await reserve.stop()
+    gc_task.cancel()
+    pool.shutdown()
+    writer.flush()
+
+
+app = FastAPI(lifespan=lifespan)
 init_db()
 
+# Versión del modelo para la caché de resultados con seed
+MODEL_VERSION = model_version()
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -31,14 +76,23 @@ app.add_middleware(
 
 UPLOAD_DIR = "ai/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
-MIS_MELODIAS_DIR = "ai/mis_melodias"
-os.makedirs(MIS_MELODIAS_DIR, exist_ok=True)
 
 
 # --------- MODELOS ---------
 class MelodyRequest(BaseModel):
     tone: str
     emotion: str
+    seed: Optional[int] = None
+
+
+class BatchItem(BaseModel):
+    tone: str
+    emotion: str
+    count: int = 1
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
 
 
 class ValoracionRequest(BaseModel):
@@ -46,9 +100,24 @@ class ValoracionRequest(BaseModel):
     puntuacion: int
 
 
+class ValoracionesBulkRequest(BaseModel):
+    midi_names: List[str]
+
+
 # --------- GENERAR MELODÍA ---------
+def construir_escala(tone: str, emotion: str) -> str:
+    base_tone = tone.strip().upper()
+    emotion = emotion.strip().lower()
+    if emotion == "sad":
+        return f"{base_tone}MINOR"
+    elif emotion == "happy":
+        return f"{base_tone}MAJOR"
+    return f"{base_tone}MINOR"
+
+
 @app.post("/generate")
-async def generate_melody(request_data: MelodyRequest, request: Request):
+async def generate_melody(request_data: MelodyRequest, request: Request,
+                          background_tasks: BackgroundTasks):
     # extraer usuario (si hay)
     token = request.headers.get("Authorization")
     username = None
@@ -59,71 +128,276 @@ async def generate_melody(request_data: MelodyRequest, request: Request):
         except JWTError:
             pass
 
-    # nombre temporal
-    tmp_name = f"tmp_{uuid.uuid4().hex[:8]}.mid"
-    tmp_path = os.path.join(MIS_MELODIAS_DIR, tmp_name)
-
     # construir escala
-    base_tone = request_data.tone.strip().upper()
-    emotion = request_data.emotion.strip().lower()
-    if emotion == "sad":
-        scale_key = f"{base_tone}MINOR"
-    elif emotion == "happy":
-        scale_key = f"{base_tone}MAJOR"
+    scale_key = construir_escala(request_data.tone, request_data.emotion)
+    if scale_key not in SCALE_DEGREES:
+        raise HTTPException(status_code=400, detail=f"Tono no válido: {request_data.tone}")
+
+    # anónimos sin seed: cualquier melodía nueva vale, se sirve de la reserva
+    midi_bytes = None
+    if username is None and request_data.seed is None:
+        midi_bytes = reserve.pop(scale_key)
+    if midi_bytes is not None:
+        cache = "reserve"
+    else:
+        # generar música (en memoria, sin pasar por disco)
+        midi_bytes, cache = await generar_midi(scale_key, request_data.seed)
+
+    # solo se guarda en disco y BD para usuarios identificados, tras responder
+    if username:
+        final_name = f"{username}_{uuid.uuid4().hex[:8]}.mid"
+        background_tasks.add_task(guardar_melodia, username, final_name, midi_bytes)
     else:
-        scale_key = f"{base_tone}MINOR"
+        final_name = f"melodia_{uuid.uuid4().hex[:8]}.mid"
+
+    return respuesta_midi(midi_bytes, final_name, request_data.seed, cache)
+
+
+@app.get("/generate/{tone}/{emotion}/{seed}")
+async def generate_compartida(tone: str, emotion: str, seed: int):
+    # enlace compartible: misma escala + seed → mismo MIDI, servido desde caché
+    scale_key = construir_escala(tone, emotion)
+    if scale_key not in SCALE_DEGREES:
+        raise HTTPException(status_code=404, detail=f"Tono no válido: {tone}")
+    midi_bytes, cache = await generar_midi(scale_key, seed)
+    return respuesta_midi(midi_bytes, f"melodia_{scale_key}_{seed}.mid", seed, cache)
+
+
+async def generar_midi(scale_key: str, seed: Optional[int] = None):
+    """
+    Devuelve (bytes, estado de caché). Las peticiones con seed se sirven
+    desde la caché de resultados si ya se generaron con el mismo modelo.
+    """
+    key = None
+    if seed is not None:
+        key = cache_key(scale_key, seed, MODEL_VERSION)
+        cached = await result_cache.aget(key)
+        if cached is not None:
+            return cached, "hit"
 
-    # generar música
     try:
-        generate_music(scale_key, output_path=tmp_path)
+        if seed is None:
+            # sin seed se agrupa con las demás peticiones en curso del mismo modo
+            midi_bytes = await batcher.generate(scale_key)
+        else:
+            midi_bytes = await pool.run(generate_music, scale_key, output_path=None, seed=seed)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(pool.retry_after())})
     except Exception as e:
         import traceback; traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"No se pudo generar música: {e}")
 
-    # nombre definitivo
-    if username:
-        final_name = f"{username}_{uuid.uuid4().hex[:8]}.mid"
-    else:
-        final_name = f"melodia_{uuid.uuid4().hex[:8]}.mid"
-    final_path = os.path.join(MIS_MELODIAS_DIR, final_name)
-    shutil.move(tmp_path, final_path)
+    if key is not None:
+        await result_cache.aput(key, midi_bytes)
+        return midi_bytes, "miss"
+    return midi_bytes, "none"
 
-    # guardar en BD
-    if username:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute(
-            "INSERT INTO mis_melodias(username, midi_name) VALUES(?, ?)",
-            (username, final_name)
-        )
-        conn.commit()
-        conn.close()
 
-    return FileResponse(final_path, filename=final_name, media_type="audio/midi")
+def respuesta_midi(midi_bytes: bytes, filename: str, seed: Optional[int], cache: str):
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Cache": cache,
+    }
+    if seed is not None:
+        headers["X-Melody-Seed"] = str(seed)
+    return Response(content=midi_bytes, media_type="audio/midi", headers=headers)
+
+
+def guardar_melodia(username: str, midi_name: str, midi_bytes: bytes):
+    # blob por contenido (deduplicado) + fila a través del escritor único
+    store.save(username, midi_name, midi_bytes)
+
+
+async def recolector_almacen():
+    # GC periódico: temporales abandonados, anónimas antiguas y blobs huérfanos
+    while True:
+        try:
+            await asyncio.to_thread(store.gc, tmp_dirs=[UPLOAD_DIR])
+        except Exception as e:
+            print(f"⚠️ Error en el GC del almacén: {e}")
+        await asyncio.sleep(STORE_GC_INTERVAL_S)
+
+
+# --------- GENERACIÓN POR LOTES ---------
+BATCH_MAX_TOTAL = int(os.environ.get("GENERATE_BATCH_MAX", "1000"))
+BATCH_CHUNK = int(os.environ.get("GENERATE_BATCH_CHUNK", "32"))
+
+
+class _ZipStream(io.RawIOBase):
+    """
+    Destino no buscable para zipfile: acumula lo escrito hasta que se vacía.
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def trocear_lote(items: List[BatchItem]):
+    """
+    Agrupa las melodías pedidas por modo y las parte en trozos de BATCH_CHUNK;
+    cada trozo es una sola inferencia por lotes en el pool.
+    """
+    por_modo = {"MINOR": [], "MAJOR": []}
+    for item in items:
+        scale_key = construir_escala(item.tone, item.emotion)
+        por_modo[scale_key[-5:]].extend([scale_key] * item.count)
+    for scales in por_modo.values():
+        for i in range(0, len(scales), BATCH_CHUNK):
+            yield scales[i:i + BATCH_CHUNK]
+
+
+async def zip_en_streaming(items: List[BatchItem]):
+    """
+    ZIP generado trozo a trozo. Si un trozo falla (cola llena, plazo vencido
+    o error del pool) la generación se detiene, pero el archivo se cierra
+    bien y ERRORES.txt indica cuántas melodías faltan y por qué: el cliente
+    nunca recibe un ZIP truncado sin aviso.
+    """
+    stream = _ZipStream()
+    contadores = {}
+    pedidas = sum(item.count for item in items)
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zf:
+        for scales in trocear_lote(items):
+            try:
+                midis = await pool.run(generate_music_batch, scales)
+            except Exception as e:
+                if isinstance(e, QueueFull):
+                    motivo = f"cola de generación llena (reintentar en {e.retry_after}s)"
+                elif isinstance(e, DeadlineExceeded):
+                    motivo = "plazo de generación vencido"
+                else:
+                    motivo = f"error de generación: {e}"
+                generadas = sum(contadores.values())
+                zf.writestr("ERRORES.txt",
+                            f"Lote incompleto: {generadas} de {pedidas} melodías generadas.\n"
+                            f"Motivo: {motivo}\n")
+                print(f"⚠️ Lote ZIP incompleto ({generadas}/{pedidas}): {motivo}")
+                break
+            for scale_key, data in zip(scales, midis):
+                contadores[scale_key] = contadores.get(scale_key, 0) + 1
+                zf.writestr(f"{scale_key}/{scale_key}_{contadores[scale_key]:04d}.mid", data)
+            yield stream.drain()
+    yield stream.drain()
+
+
+@app.post("/generate/batch")
+async def generate_batch(batch: BatchRequest):
+    total = sum(item.count for item in batch.items)
+    if any(item.count < 1 for item in batch.items) or total == 0:
+        raise HTTPException(status_code=400, detail="Cada elemento debe pedir al menos una melodía")
+    if total > BATCH_MAX_TOTAL:
+        raise HTTPException(status_code=400, detail=f"Máximo {BATCH_MAX_TOTAL} melodías por lote")
+    for item in batch.items:
+        if construir_escala(item.tone, item.emotion) not in SCALE_DEGREES:
+            raise HTTPException(status_code=400, detail=f"Tono no válido: {item.tone}")
+    if pool.queue_depth() >= pool.max_queue:
+        raise HTTPException(status_code=503, detail="Cola de generación llena",
+                            headers={"Retry-After": str(pool.retry_after())})
+
+    return StreamingResponse(
+        zip_en_streaming(batch.items),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="melodias.zip"'}
+    )
+
+
+# --------- GENERACIÓN EN STREAMING (SSE) ---------
+STREAM_MAX_LENGTH = int(os.environ.get("GENERATE_STREAM_MAX_LENGTH", "512"))
+
+
+def evento_sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos)}\n\n"
+
+
+async def eventos_generacion(scale_key: str, length: int):
+    try:
+        async for tipo, datos in pool.stream(iter_music_events, scale_key, length):
+            if tipo == "midi":
+                datos = {
+                    "filename": f"melodia_{uuid.uuid4().hex[:8]}.mid",
+                    "midi_base64": base64.b64encode(datos).decode("ascii"),
+                }
+            yield evento_sse(tipo, datos)
+    except Exception as e:
+        yield evento_sse("error", {"detail": f"No se pudo generar música: {e}"})
+
+
+@app.get("/generate/stream")
+async def generate_stream(tone: str, emotion: str, length: int = 8):
+    scale_key = construir_escala(tone, emotion)
+    if scale_key not in SCALE_DEGREES:
+        raise HTTPException(status_code=400, detail=f"Tono no válido: {tone}")
+    if not (1 <= length <= STREAM_MAX_LENGTH):
+        raise HTTPException(status_code=400, detail=f"length debe estar entre 1 y {STREAM_MAX_LENGTH}")
+    if pool.queue_depth() >= pool.max_queue:
+        raise HTTPException(status_code=503, detail="Cola de generación llena",
+                            headers={"Retry-After": str(pool.retry_after())})
+
+    return StreamingResponse(
+        eventos_generacion(scale_key, length),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# --------- ESTADO ---------
+@app.get("/estado/modelos")
+async def estado_modelos():
+    return await pool.run(pipelines_report)
+
+
+@app.get("/estado/generacion")
+def estado_generacion():
+    return {**pool.stats(), "batching": batcher.stats()}
+
+
+@app.get("/estado/cache")
+def estado_cache():
+    return {"model_version": MODEL_VERSION, **result_cache.stats()}
+
+
+@app.get("/estado/reserva")
+def estado_reserva():
+    return reserve.stats()
+
+
+@app.get("/estado/db")
+def estado_db():
+    return {**writer.stats(), "almacen": store.stats()}
 
 
 # --------- AUTENTICACIÓN & USUARIOS ---------
 @app.post("/register")
 def register(username: str = Form(...), password: str = Form(...)):
     hashed = hash_password(password)
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     try:
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed))
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="El usuario ya existe")
-    finally:
-        conn.close()
     return {"message": f"Usuario {username} registrado correctamente"}
 
 
 @app.post("/login")
 def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username = ?", (form_data.username,))
-    result = c.fetchone()
-    conn.close()
+    result = get_connection().execute(
+        "SELECT password FROM users WHERE username = ?", (form_data.username,)
+    ).fetchone()
 
     if not result or not verify_password(form_data.password, result[0]):
         raise HTTPException(status_code=401, detail="Credenciales incorrectas")
@@ -133,9 +407,29 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 
 # --------- MELODÍAS PÚBLICAS ---------
+CATALOGO_PAGE_MAX = int(os.environ.get("CATALOGO_PAGE_MAX", "200"))
+
+
 @app.get("/melodias")
 def listar_melodias():
-    return [f for f in os.listdir(UPLOAD_DIR) if f.endswith(".mid")]
+    # nombres desde el catálogo, sin listar el directorio en cada petición
+    return catalog.names()
+
+
+@app.get("/melodias/catalogo")
+def catalogo_melodias(sort: str = "fecha", desc: bool = True, limit: int = 50,
+                      cursor: Optional[str] = None, tonalidad: Optional[str] = None,
+                      username: Optional[str] = None,
+                      min_duracion: Optional[float] = None,
+                      max_duracion: Optional[float] = None):
+    if not (1 <= limit <= CATALOGO_PAGE_MAX):
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {CATALOGO_PAGE_MAX}")
+    try:
+        return catalog.page(sort, desc, limit, cursor,
+                            tonalidad.upper() if tonalidad else None, username,
+                            min_duracion, max_duracion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/melodias/{filename}")
@@ -147,70 +441,207 @@ def descargar_melodia(filename: str):
 
 
 # --------- SUBIR MELODÍA PÚBLICA ---------
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024)))
+# margen para las cabeceras multipart y otros campos del formulario
+UPLOAD_MAX_BODY = UPLOAD_MAX_BYTES + 64 * 1024
+
+
+async def archivo_multipart(request: Request, campo: str):
+    """
+    Lee el cuerpo multipart/form-data directamente de request.stream() y
+    entrega (filename, trozo) de la parte `campo` a medida que llega, sin
+    guardar el formulario entero; el resto de partes se descarta.
+    Lanza 400 si el cuerpo no es multipart o falta la parte, y 413 si el
+    cuerpo supera UPLOAD_MAX_BODY.
+    """
+    tipo, opciones = parse_options_header(request.headers.get("content-type", ""))
+    boundary = opciones.get(b"boundary")
+    if tipo != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data")
+
+    parte = {}          # cabeceras y disposición de la parte en curso
+    trozos = []         # datos de `campo` pendientes de entregar
+    encontrado = False
+    filename = ""
+
+    def on_part_begin():
+        parte.clear()
+        parte["cabeceras"] = {}
+        parte["campo"] = parte["valor"] = b""
+
+    def on_header_field(data, start, end):
+        parte["campo"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        parte["valor"] += data[start:end]
+
+    def on_header_end():
+        parte["cabeceras"][parte["campo"].lower()] = parte["valor"]
+        parte["campo"] = parte["valor"] = b""
+
+    def on_headers_finished():
+        nonlocal encontrado, filename
+        _, disp = parse_options_header(parte["cabeceras"].get(b"content-disposition", b""))
+        parte["leer"] = disp.get(b"name", b"").decode("latin-1") == campo and not encontrado
+        if parte["leer"]:
+            encontrado = True
+            filename = disp.get(b"filename", b"").decode("utf-8", "replace")
+            trozos.append(b"")      # avisa del nombre antes del primer dato
+
+    def on_part_data(data, start, end):
+        if parte.get("leer"):
+            trozos.append(data[start:end])
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    recibido = 0
+    async for chunk in request.stream():
+        recibido += len(chunk)
+        if recibido > UPLOAD_MAX_BODY:
+            raise HTTPException(status_code=413, detail=f"Máximo {UPLOAD_MAX_BYTES} bytes por archivo")
+        try:
+            parser.write(chunk)
+        except FormParserError as e:
+            raise HTTPException(status_code=400, detail=f"Formulario no válido: {e}")
+        for trozo in trozos:
+            yield filename, trozo
+        trozos.clear()
+    try:
+        parser.finalize()
+    except FormParserError as e:
+        raise HTTPException(status_code=400, detail=f"Formulario no válido: {e}")
+    if not encontrado:
+        raise HTTPException(status_code=400, detail=f"Falta el archivo '{campo}'")
+
+
 @app.post("/melodias/upload")
-async def subir_melodia(file: UploadFile = File(...), username: str = Depends(get_current_user)):
-    if not file.filename.endswith(".mid"):
-        raise HTTPException(status_code=400, detail="Solo se permiten archivos .mid")
-    path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(path, "wb") as f:
-        f.write(await file.read())
-    return JSONResponse({"message": f"Melodía {file.filename} subida por {username}"}, status_code=201)
+async def subir_melodia(request: Request, username: str = Depends(get_current_user)):
+    # rechazo temprano si el cuerpo ya declara un tamaño excesivo
+    declarado = request.headers.get("content-length")
+    if declarado and declarado.isdigit() and int(declarado) > UPLOAD_MAX_BODY:
+        raise HTTPException(status_code=413, detail=f"Máximo {UPLOAD_MAX_BYTES} bytes por archivo")
+
+    # el cuerpo se procesa según llega de la red: cada trozo del archivo se
+    # valida (estructura MIDI y tamaño) y se copia a un temporal del mismo
+    # directorio, que solo se hace visible con os.replace
+    validator = MidiStreamValidator(UPLOAD_MAX_BYTES)
+    filename = None
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix="tmp_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for nombre, chunk in archivo_multipart(request, "file"):
+                if filename is None:
+                    filename = os.path.basename(nombre)
+                    if not filename.endswith(".mid"):
+                        raise HTTPException(status_code=400, detail="Solo se permiten archivos .mid")
+                validator.feed(chunk)
+                f.write(chunk)
+        validator.close()
+        path = os.path.join(UPLOAD_DIR, filename)
+        os.replace(tmp_path, path)
+    except MidiTooLarge as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidMidi as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=400, detail=f"MIDI no válido: {e}")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    # metadatos extraídos una sola vez, al subir
+    await asyncio.to_thread(catalog.register_file, filename, path, username)
+    return JSONResponse({"message": f"Melodía {filename} subida por {username}"}, status_code=201)
 
 
 # --------- VALORACIONES ---------
+VALORACIONES_BULK_MAX = int(os.environ.get("VALORACIONES_BULK_MAX", "1000"))
+VALORACIONES_TOP_MAX = int(os.environ.get("VALORACIONES_TOP_MAX", "100"))
+
+
 @app.post("/valorar")
 def valorar_melodia(valoracion: ValoracionRequest, username: str = Depends(get_current_user)):
     if not (1 <= valoracion.puntuacion <= 5):
         raise HTTPException(status_code=400, detail="La puntuación debe ser entre 1 y 5")
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id FROM valoraciones WHERE midi_name = ? AND username = ?", (valoracion.midi_name, username))
-    if c.fetchone():
-        conn.close()
+    # el índice único (midi_name, username) impide valorar dos veces
+    try:
+        with transaction() as conn:
+            conn.execute("INSERT INTO valoraciones (midi_name, username, puntuacion) VALUES (?, ?, ?)",
+                         (valoracion.midi_name, username, valoracion.puntuacion))
+            # agregado incremental en la misma transacción
+            conn.execute(
+                "INSERT INTO valoraciones_resumen (midi_name, suma, cantidad, media) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(midi_name) DO UPDATE SET suma = suma + excluded.suma, "
+                "cantidad = cantidad + 1, media = (suma + excluded.suma) * 1.0 / (cantidad + 1)",
+                (valoracion.midi_name, valoracion.puntuacion, valoracion.puntuacion)
+            )
+    except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Ya has valorado esta melodía")
-    c.execute("INSERT INTO valoraciones (midi_name, username, puntuacion) VALUES (?, ?, ?)",
-              (valoracion.midi_name, username, valoracion.puntuacion))
-    conn.commit()
-    conn.close()
     return {"message": "Valoración registrada correctamente"}
 
 
-@app.get("/valoraciones/{midi_name}")
-def obtener_valoracion(midi_name: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT AVG(puntuacion), COUNT(*) FROM valoraciones WHERE midi_name = ?", (midi_name,))
-    avg, cnt = c.fetchone()
-    conn.close()
+def resumen_valoracion(midi_name: str, suma, cantidad) -> dict:
     return {
         "midi_name": midi_name,
-        "valoracion_media": round(avg, 2) if cnt else None,
-        "cantidad_votos": cnt
+        "valoracion_media": round(suma / cantidad, 2) if cantidad else None,
+        "cantidad_votos": cantidad or 0
     }
 
 
+# las rutas fijas van antes de /valoraciones/{midi_name}
+@app.get("/valoraciones/top")
+def ranking_valoraciones(k: int = 10, min_votos: int = 1):
+    if not (1 <= k <= VALORACIONES_TOP_MAX):
+        raise HTTPException(status_code=400, detail=f"k debe estar entre 1 y {VALORACIONES_TOP_MAX}")
+    rows = get_connection().execute(
+        "SELECT midi_name, suma, cantidad FROM valoraciones_resumen "
+        "WHERE cantidad >= ? ORDER BY media DESC, cantidad DESC LIMIT ?",
+        (min_votos, k)
+    ).fetchall()
+    return [resumen_valoracion(*r) for r in rows]
+
+
+@app.post("/valoraciones/bulk")
+def obtener_valoraciones(peticion: ValoracionesBulkRequest):
+    nombres = list(dict.fromkeys(peticion.midi_names))
+    if len(nombres) > VALORACIONES_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo {VALORACIONES_BULK_MAX} melodías por petición")
+    # una sola consulta por clave primaria para toda la página
+    encontrados = {
+        r[0]: r for r in get_connection().execute(
+            "SELECT midi_name, suma, cantidad FROM valoraciones_resumen "
+            "WHERE midi_name IN (SELECT value FROM json_each(?))",
+            (json.dumps(nombres),)
+        )
+    }
+    return [resumen_valoracion(*encontrados.get(n, (n, 0, 0))) for n in nombres]
+
+
+@app.get("/valoraciones/{midi_name}")
+def obtener_valoracion(midi_name: str):
+    row = get_connection().execute(
+        "SELECT suma, cantidad FROM valoraciones_resumen WHERE midi_name = ?", (midi_name,)
+    ).fetchone()
+    return resumen_valoracion(midi_name, *(row or (0, 0)))
+
+
 # --------- MIS MELODÍAS ---------
 @app.get("/mis-melodias")
 def obtener_mis_melodias(username: str = Depends(get_current_user)):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT midi_name FROM mis_melodias WHERE username = ?", (username,))
-    rows = [r[0] for r in c.fetchall()]
-    conn.close()
-    # solo archivos que aún existan
-    return [m for m in rows if os.path.exists(os.path.join(MIS_MELODIAS_DIR, m))]
+    # solo las que tienen blob: la existencia se registra en la BD
+    return store.list_names(username)
 
 
 @app.get("/mis-melodias/{filename}")
 def descargar_melodia_personal(filename: str, username: str = Depends(get_current_user)):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM mis_melodias WHERE username = ? AND midi_name = ?", (username, filename))
-    if not c.fetchone():
-        conn.close()
+    permitido, path = store.resolve(username, filename)
+    if not permitido:
         raise HTTPException(status_code=403, detail="No tienes permiso para esta melodía")
-    conn.close()
-    path = os.path.join(MIS_MELODIAS_DIR, filename)
-    if os.path.exists(path):
+    if path and os.path.exists(path):
         return FileResponse(path, filename=filename, media_type="audio/midi")
     raise HTTPException(status_code=404, detail="Archivo no encontrado")
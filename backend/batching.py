@@ -0,0 +1,107 @@
+# backend/batching.py
+
+import asyncio
+import os
+
+from backend.generate_music import generate_music_batch
+from backend.worker_pool import pool, QueueFull, DeadlineExceeded
+
+# —————————————————————————————————————————————————————————————————————————
+# Configuración (variables de entorno)
+BATCH_WAIT_MS = float(os.environ.get('MELODY_BATCH_WAIT_MS', '2'))
+BATCH_MAX     = int(os.environ.get('MELODY_BATCH_MAX', '64'))
+
+# —————————————————————————————————————————————————————————————————————————
+class RequestBatcher:
+    """
+    Agrupa las peticiones de generación sin seed que llegan casi a la vez
+    y las envía al pool como una sola tarea de generate_music_batch: una
+    inferencia por lotes por paso para todas ellas.
+    Cada proceso del pool ejecuta una tarea cada vez, así que el lote se
+    forma aquí, antes de despachar. Se espera como máximo `wait_ms` desde
+    la primera petición del lote (o hasta `max_batch` peticiones).
+    """
+    def __init__(self, pool, wait_ms: float = BATCH_WAIT_MS, max_batch: int = BATCH_MAX):
+        self.pool      = pool
+        self.wait_ms   = wait_ms
+        self.max_batch = max_batch
+        self._pending  = {}      # modo -> [(escala, future)]
+        self._timers   = {}
+        self._tasks    = set()
+        self.batches   = 0
+        self.rows      = 0
+
+    async def generate(self, scale_key: str) -> bytes:
+        """
+        MIDI de una melodía nueva para scale_key. Propaga QueueFull y
+        DeadlineExceeded del pool.
+        """
+        if self.wait_ms <= 0 or self.max_batch <= 1:
+            midis = await self.pool.run(generate_music_batch, [scale_key])
+            self._count(1)
+            return midis[0]
+
+        loop = asyncio.get_running_loop()
+        mode = scale_key[-5:]          # generate_music_batch exige un solo modo
+        fut  = loop.create_future()
+        items = self._pending.setdefault(mode, [])
+        items.append((scale_key, fut))
+        if len(items) >= self.max_batch:
+            self._flush(mode)
+        elif mode not in self._timers:
+            self._timers[mode] = loop.call_later(self.wait_ms / 1000.0, self._flush, mode)
+        return await fut
+
+    def _flush(self, mode: str):
+        timer = self._timers.pop(mode, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(mode, [])
+        if items:
+            task = asyncio.create_task(self._dispatch(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, items):
+        try:
+            midis = await self.pool.run(generate_music_batch, [s for s, _ in items])
+        except (QueueFull, DeadlineExceeded) as e:
+            # falta de capacidad: afecta a todo el lote por igual
+            self._fail(items, e)
+            return
+        except Exception as e:
+            scales = list(dict.fromkeys(s for s, _ in items))
+            if len(scales) == 1:
+                self._fail(items, e)
+            else:
+                # Reintentar escala por escala para que una que falla no
+                # arrastre al resto del lote
+                for scale in scales:
+                    await self._dispatch([item for item in items if item[0] == scale])
+            return
+        self._count(len(items))
+        for (_, fut), data in zip(items, midis):
+            # el cliente puede haberse desconectado mientras tanto
+            if not fut.done():
+                fut.set_result(data)
+
+    def _fail(self, items, error: Exception):
+        for _, fut in items:
+            if not fut.done():
+                fut.set_exception(error)
+
+    def _count(self, rows: int):
+        self.batches += 1
+        self.rows    += rows
+
+    def stats(self) -> dict:
+        return {
+            'wait_ms':        self.wait_ms,
+            'max_batch':      self.max_batch,
+            'batches':        self.batches,
+            'rows':           self.rows,
+            'avg_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'pending':        sum(len(v) for v in self._pending.values()),
+        }
+
+batcher = RequestBatcher(pool)
@@ -0,0 +1,58 @@
+# backend/bench_generate.py
+#
+# Mide el throughput de POST /generate (anónimo, sin seed) a través de la
+# app completa: lifespan, pool de procesos y RequestBatcher. Compara la
+# agrupación de peticiones desactivada (wait 0) y activada, con 1, 8 y 32
+# clientes concurrentes.
+#
+#   MELODY_BACKEND=numpy python -m backend.bench_generate [peticiones]
+
+import os
+import sys
+import time
+
+# La reserva serviría las peticiones anónimas sin pasar por el modelo
+os.environ['MELODY_RESERVE_SIZE'] = '0'
+
+import asyncio
+
+import httpx
+
+from backend.app import app
+from backend.batching import batcher, BATCH_WAIT_MS
+
+# —————————————————————————————————————————————————————————————————————————
+async def run_level(client, concurrency: int, total: int) -> float:
+    """
+    Lanza `total` peticiones con `concurrency` clientes; devuelve melodías/s.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            r = await client.post('/generate', json={'tone': 'C', 'emotion': 'happy' if i % 2 else 'sad'})
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start)
+
+async def main(total: int):
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+            # calentamiento: los procesos del pool terminan de precargar los modelos
+            await run_level(client, 2, 4)
+            wait_on = BATCH_WAIT_MS if BATCH_WAIT_MS > 0 else 2.0
+            print(f"{'clientes':>8} {'sin lotes (mel/s)':>18} {'con lotes (mel/s)':>18} {'lote medio':>11}")
+            for concurrency in (1, 8, 32):
+                batcher.wait_ms = 0
+                off = await run_level(client, concurrency, total)
+                batcher.wait_ms = wait_on
+                b0, r0 = batcher.batches, batcher.rows
+                on = await run_level(client, concurrency, total)
+                avg = (batcher.rows - r0) / max(1, batcher.batches - b0)
+                print(f"{concurrency:>8} {off:>18.1f} {on:>18.1f} {avg:>11.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 64))
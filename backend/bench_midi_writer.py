@@ -0,0 +1,83 @@
+# backend/bench_midi_writer.py
+#
+# Compara el escritor MIDI lineal (backend.midi_writer) con el escritor
+# anterior basado en mido.Message + events.sort, a 8, 1k y 100k notas.
+#
+#   python -m backend.bench_midi_writer
+
+import io
+import random
+import time
+
+from mido import MidiFile, MidiTrack, Message
+
+from backend.generate_music import clamp_to_range, TICKS_PER_BEAT
+from backend.midi_writer import write_midi
+
+# —————————————————————————————————————————————————————————————————————————
+def render_with_mido(chords, chord_durs, melody, mel_durs, rng):
+    """
+    Escritor original: un Message por nota, lista única y events.sort.
+    """
+    events, abs_time = [], 0
+    for chord, dur in zip(chords, chord_durs):
+        for note in chord:
+            note_up = clamp_to_range(note + 12)
+            vel     = rng.randint(63, 80)
+            events.append((abs_time, Message('note_on',  note=note_up, velocity=vel)))
+            events.append((abs_time + dur, Message('note_off', note=note_up, velocity=vel)))
+        abs_time += dur
+
+    abs_time = 0
+    for n, dur in zip(melody, mel_durs):
+        nm  = clamp_to_range(n)
+        vel = rng.randint(53, 70)
+        events.append((abs_time,         Message('note_on',  note=nm, velocity=vel)))
+        events.append((abs_time + dur,   Message('note_off', note=nm, velocity=vel)))
+        abs_time += dur
+
+    events.sort(key=lambda x: x[0])
+    mid   = MidiFile(ticks_per_beat=TICKS_PER_BEAT)
+    track = MidiTrack(); mid.tracks.append(track)
+    last_time = 0
+    for abs_t, msg in events:
+        msg.time = abs_t - last_time
+        track.append(msg)
+        last_time = abs_t
+
+    buf = io.BytesIO()
+    mid.save(file=buf)
+    return buf.getvalue()
+
+def render_linear(chords, chord_durs, melody, mel_durs, rng):
+    return write_midi(chords, chord_durs, melody, mel_durs,
+                      TICKS_PER_BEAT, clamp_to_range, rng)
+
+def make_piece(n_notes: int, rng):
+    """
+    Melodía de n_notes notas y acordes de 5 notas con la misma duración total.
+    """
+    melody   = [rng.randint(48, 84) for _ in range(n_notes)]
+    mel_durs = [rng.choice([96, 192, 384]) for _ in range(n_notes)]
+    n_chords = max(1, n_notes // 2)
+    total    = sum(mel_durs)
+    chord_durs = [total // n_chords] * n_chords
+    chords   = [[rng.randint(36, 72) for _ in range(5)] for _ in range(n_chords)]
+    return chords, chord_durs, melody, mel_durs
+
+def bench(fn, piece, seed, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        rng = random.Random(seed)
+        t0 = time.perf_counter()
+        data = fn(*piece, rng)
+        best = min(best, time.perf_counter() - t0)
+    return best, data
+
+if __name__ == "__main__":
+    print(f"{'notas':>8} {'mido (s)':>10} {'lineal (s)':>11} {'speedup':>8}  idéntico")
+    for n_notes, repeat in ((8, 200), (1_000, 10), (100_000, 1)):
+        piece = make_piece(n_notes, random.Random(n_notes))
+        t_old, old = bench(render_with_mido, piece, 0, repeat)
+        t_new, new = bench(render_linear,    piece, 0, repeat)
+        print(f"{n_notes:>8} {t_old:>10.5f} {t_new:>11.5f} {t_old / t_new:>7.1f}x  {old == new}")
@@ -0,0 +1,124 @@
+# backend/catalog.py
+
+import base64
+import json
+import os
+import time
+
+from backend.db import get_connection, transaction
+from backend.midi_metadata import extract_metadata
+
+# —————————————————————————————————————————————————————————————————————————
+# Catálogo de melodías públicas: una fila por archivo subido con sus
+# metadatos, para listar, ordenar y filtrar sin recorrer el directorio.
+
+SORT_COLUMNS = {
+    'fecha':    'subido',
+    'nombre':   'midi_name',
+    'duracion': 'duracion',
+    'notas':    'notas',
+}
+
+COLUMNS = ('midi_name', 'username', 'bytes', 'duracion', 'notas', 'pistas', 'tonalidad', 'subido')
+
+def register(midi_name: str, data: bytes, username: str = None, subido: float = None) -> dict:
+    """
+    Extrae los metadatos de un MIDI y lo da de alta (o lo actualiza).
+    """
+    try:
+        meta = extract_metadata(data)
+    except Exception as e:
+        print(f"⚠️ No se pudieron leer los metadatos de {midi_name}: {e}")
+        # 0 y no NULL, para que la fila siga entrando en la paginación por cursor
+        meta = {'duracion': 0.0, 'notas': 0, 'pistas': 0, 'tonalidad': None}
+    row = {
+        'midi_name': midi_name, 'username': username, 'bytes': len(data),
+        **meta, 'subido': subido if subido is not None else time.time(),
+    }
+    with transaction() as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO catalogo ({', '.join(COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})",
+            tuple(row[c] for c in COLUMNS)
+        )
+    return row
+
+def register_file(midi_name: str, path: str, username: str = None, subido: float = None) -> dict:
+    with open(path, 'rb') as f:
+        return register(midi_name, f.read(), username, subido)
+
+def backfill(upload_dir: str) -> int:
+    """
+    Da de alta los .mid del directorio que aún no están en el catálogo
+    (subidas anteriores a su creación). Devuelve cuántos se añadieron.
+    """
+    known = {r[0] for r in get_connection().execute("SELECT midi_name FROM catalogo")}
+    added = 0
+    for name in sorted(os.listdir(upload_dir)):
+        if not name.endswith('.mid') or name in known:
+            continue
+        path = os.path.join(upload_dir, name)
+        register_file(name, path, subido=os.path.getmtime(path))
+        added += 1
+    if added:
+        print(f"📚 Catálogo: {added} melodías indexadas desde {upload_dir}")
+    return added
+
+def names() -> list:
+    return [r[0] for r in get_connection().execute(
+        "SELECT midi_name FROM catalogo ORDER BY midi_name"
+    )]
+
+def _encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor no válido")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Cursor no válido")
+    return values
+
+def page(sort: str = 'fecha', desc: bool = True, limit: int = 50, cursor: str = None,
+         tonalidad: str = None, username: str = None,
+         min_duracion: float = None, max_duracion: float = None) -> dict:
+    """
+    Página del catálogo con paginación por cursor (keyset): el cursor guarda
+    (valor de ordenación, nombre) de la última fila, así cada página es una
+    búsqueda por índice sin OFFSET.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Orden no válido: {sort}")
+    col = SORT_COLUMNS[sort]
+    op  = '<' if desc else '>'
+    way = 'DESC' if desc else 'ASC'
+
+    where, params = [], []
+    for sql, value in (("tonalidad = ?", tonalidad), ("username = ?", username),
+                       ("duracion >= ?", min_duracion), ("duracion <= ?", max_duracion)):
+        if value is not None:
+            where.append(sql)
+            params.append(value)
+    if cursor:
+        last = _decode_cursor(cursor)
+        if col == 'midi_name':
+            where.append(f"midi_name {op} ?")
+            params.append(last[1])
+        else:
+            where.append(f"({col}, midi_name) {op} (?, ?)")
+            params.extend(last)
+
+    sql = f"SELECT {', '.join(COLUMNS)} FROM catalogo"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {col} {way}, midi_name {way} LIMIT ?"
+    rows = get_connection().execute(sql, (*params, limit + 1)).fetchall()
+
+    items = [dict(zip(COLUMNS, r)) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = _encode_cursor([last[col], last['midi_name']])
+    return {'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,260 @@
+# backend/db.py
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# —————————————————————————————————————————————————————————————————————————
+# Configuración (variables de entorno)
+DB_PATH           = os.environ.get('DB_PATH', 'users.db')
+DB_BUSY_TIMEOUT_S = float(os.environ.get('DB_BUSY_TIMEOUT_S', '5'))
+DB_WRITE_BATCH    = int(os.environ.get('DB_WRITE_BATCH', '256'))
+DB_WRITE_RETRIES  = int(os.environ.get('DB_WRITE_RETRIES', '3'))
+
+# —————————————————————————————————————————————————————————————————————————
+# Migraciones versionadas: se aplican en orden las que superen
+# PRAGMA user_version, cada una en su propia transacción.
+
+MIGRATIONS = [
+    # 1: esquema original (IF NOT EXISTS: las bases existentes ya lo tienen)
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS valoraciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            midi_name TEXT NOT NULL,
+            username TEXT NOT NULL,
+            puntuacion INTEGER NOT NULL CHECK (puntuacion >= 1 AND puntuacion <= 5),
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS mis_melodias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            midi_name TEXT NOT NULL,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    # 2: índices y una valoración por usuario y melodía (se conserva la primera)
+    (2, [
+        """
+        DELETE FROM valoraciones WHERE id NOT IN (
+            SELECT MIN(id) FROM valoraciones GROUP BY midi_name, username
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_valoraciones_midi_user ON valoraciones(midi_name, username)",
+        "CREATE INDEX IF NOT EXISTS ix_mis_melodias_user ON mis_melodias(username, midi_name)",
+    ]),
+    # 3: agregados de valoraciones por melodía, mantenidos en cada /valorar
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS valoraciones_resumen (
+            midi_name TEXT PRIMARY KEY,
+            suma INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            media REAL NOT NULL
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO valoraciones_resumen (midi_name, suma, cantidad, media)
+        SELECT midi_name, SUM(puntuacion), COUNT(*), AVG(puntuacion)
+        FROM valoraciones GROUP BY midi_name
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_resumen_ranking ON valoraciones_resumen(media DESC, cantidad DESC)",
+    ]),
+    # 4: catálogo de melodías públicas con sus metadatos
+    (4, [
+        """
+        CREATE TABLE IF NOT EXISTS catalogo (
+            midi_name TEXT PRIMARY KEY,
+            username TEXT,
+            bytes INTEGER NOT NULL,
+            duracion REAL,
+            notas INTEGER,
+            pistas INTEGER,
+            tonalidad TEXT,
+            subido REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_catalogo_subido ON catalogo(subido, midi_name)",
+        "CREATE INDEX IF NOT EXISTS ix_catalogo_duracion ON catalogo(duracion, midi_name)",
+        "CREATE INDEX IF NOT EXISTS ix_catalogo_notas ON catalogo(notas, midi_name)",
+        "CREATE INDEX IF NOT EXISTS ix_catalogo_tonalidad ON catalogo(tonalidad, subido, midi_name)",
+        "CREATE INDEX IF NOT EXISTS ix_catalogo_usuario ON catalogo(username, subido, midi_name)",
+    ]),
+    # 5: almacén por contenido de mis_melodias (ver backend/melody_store.py)
+    (5, [
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            bytes INTEGER NOT NULL,
+            creado REAL NOT NULL
+        )
+        """,
+        "ALTER TABLE mis_melodias ADD COLUMN sha256 TEXT",
+        "CREATE INDEX IF NOT EXISTS ix_mis_melodias_sha ON mis_melodias(sha256)",
+        "CREATE INDEX IF NOT EXISTS ix_blobs_creado ON blobs(creado)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# —————————————————————————————————————————————————————————————————————————
+_local = threading.local()
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_S)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def get_connection(path: str = None) -> sqlite3.Connection:
+    """
+    Conexión reutilizada por hilo (los endpoints síncronos de FastAPI se
+    ejecutan en un pool de hilos fijo).
+    """
+    path  = path or DB_PATH
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+@contextmanager
+def transaction(path: str = None):
+    """
+    with transaction() as conn: ... → commit al salir, rollback si hay error.
+    """
+    conn = get_connection(path)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def migrate(path: str = None) -> int:
+    """
+    Aplica las migraciones pendientes y devuelve la versión del esquema.
+    """
+    conn = get_connection(path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        with transaction(path) as c:
+            c.execute("BEGIN")
+            for sql in statements:
+                c.execute(sql)
+            c.execute(f"PRAGMA user_version = {target}")
+        print(f"🗄️ Migración {target} aplicada en {path or DB_PATH}")
+        version = target
+    return version
+
+# —————————————————————————————————————————————————————————————————————————
+class DbWriter:
+    """
+    Escritor único en segundo plano: agrupa las inserciones pendientes y
+    las confirma en una sola transacción, fuera del camino de la petición.
+    """
+    def __init__(self, path: str = None, max_batch: int = DB_WRITE_BATCH):
+        self.path      = path
+        self.max_batch = max_batch
+        self._queue    = queue.Queue()
+        self._thread   = None
+        self._lock     = threading.Lock()
+        self.batches   = 0
+        self.writes    = 0
+        self.failed    = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def submit(self, sql: str, params: tuple = ()):
+        self.start()
+        self._queue.put((sql, params))
+
+    def flush(self):
+        """
+        Espera a que se escriba todo lo encolado hasta ahora.
+        """
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            writes  = [w for w in batch if not isinstance(w, threading.Event)]
+            if writes:
+                self._write(writes)
+            for w in batch:
+                if isinstance(w, threading.Event):
+                    w.set()
+
+    def _commit(self, writes) -> None:
+        # Una transacción; si la BD está bloqueada (tras DB_BUSY_TIMEOUT_S)
+        # se reintenta unas pocas veces antes de rendirse
+        for attempt in range(DB_WRITE_RETRIES + 1):
+            try:
+                with transaction(self.path) as conn:
+                    for sql, params in writes:
+                        conn.execute(sql, params)
+                return
+            except sqlite3.OperationalError:
+                if attempt == DB_WRITE_RETRIES:
+                    raise
+                time.sleep(0.1 * 2 ** attempt)
+
+    def _write(self, writes) -> None:
+        """
+        Confirma el lote entero; si falla, sentencia a sentencia, de modo que
+        solo se pierde la que falla y no las filas de otros usuarios (una
+        fila de mis_melodias perdida deja su blob huérfano para el GC).
+        """
+        try:
+            self._commit(writes)
+            self.batches += 1
+            self.writes  += len(writes)
+            return
+        except Exception as e:
+            if len(writes) == 1:
+                self.failed += 1
+                print(f"⚠️ Error escribiendo en la BD: {e} ({writes[0][0]})")
+                return
+            print(f"⚠️ Error escribiendo {len(writes)} filas en la BD, se reintentan una a una: {e}")
+        for write in writes:
+            self._write([write])
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'writes':  self.writes,
+            'failed':  self.failed,
+            'pending': self._queue.qsize(),
+        }
+
+writer = DbWriter()
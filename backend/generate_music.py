@@ -1,14 +1,18 @@
 # backend/generate_music.py
 
 import os
-import json
-import pickle
 import random
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Iterator, List, Tuple
 
 import numpy as np
-import tensorflow as tf
-from mido import MidiFile, MidiTrack, Message
+
+from backend.model_registry import registry, MODES
+from backend.seed_index import SeedIndex
+from backend.midi_writer import write_midi
+from backend.music_theory import (
+    SCALE_DEGREES, clamp_to_range, snap_notes, chord_voicing, root_semitone, SCALE_INDEX
+)
 
 # —————————————————————————————————————————————————————————————————————————
 # Paths y configuración
@@ -16,10 +20,13 @@ BASE_DIR             = os.path.dirname(os.path.abspath(__file__))
 AI_DIR               = os.path.join(BASE_DIR, '..', 'ai')
 
 # Triads & progresiones (idéntico a antes)
-LOWER_BOUND     = 24   # C3
-UPPER_BOUND     = 84   # C6
 TICKS_PER_BEAT  = 384
 
+# Decodificación: 'window' (re-ejecuta los 16 pasos por nota) o 'incremental'
+# (conserva los estados de la LSTM). No son equivalentes: solo la primera nota
+# coincide; ver INCREMENTAL_MAX_DRIFT en backend.numpy_lstm
+DECODING = os.environ.get('MELODY_DECODING', 'window').lower()
+
 DURATION_PATTERNS = [
     [4,4,4,4],
     [2,6,2,6],
@@ -33,238 +40,259 @@ PROGRESSIONS = [
     [0,6,0,4],
 ]
 
-# Cargar grados de escala
-DEGREES_PATH   = os.path.join(AI_DIR, 'scale_degrees.json')
-with open(DEGREES_PATH, 'r') as f:
-    SCALE_DEGREES = json.load(f)
-
-# Utilitarios de semitonos
-NOTE_TO_SEMITONE = {
-    "C":0, "C#":1, "Db":1, "D":2, "D#":3, "Eb":3,
-    "E":4, "Fb":4, "F":5, "E#":5, "F#":6, "Gb":6,
-    "G":7, "G#":8, "Ab":8, "A":9, "A#":10,"Bb":10,
-    "B":11,"Cb":11
-}
-
 # —————————————————————————————————————————————————————————————————————————
-def clamp_to_range(n: int) -> int:
-    while n < LOWER_BOUND: n += 12
-    while n > UPPER_BOUND: n -= 12
-    return n
+def load_pipeline(scale_type: str):
+    """
+    Devuelve el modelo LSTM y scalers para 'minor' o 'major',
+    así como la ruta del conjunto de datos correspondiente.
+    Se cargan una sola vez por proceso (ver backend.model_registry).
+    """
+    mode = 'major' if scale_type == 'major' else 'minor'
+    return registry.get(mode).as_tuple()
 
-def is_semitone_in_scale(midi_note: int, scale: str) -> bool:
-    sems = [NOTE_TO_SEMITONE[n] for n in SCALE_DEGREES[scale]]
-    return (midi_note % 12) in sems
+@lru_cache(maxsize=None)
+def load_seed_index(mode: str) -> SeedIndex:
+    """
+    Índice de semillas del modo, construido una sola vez por proceso.
+    """
+    root_pc = {s: root_semitone(s) for s in SCALE_DEGREES}
+    return SeedIndex.from_path(registry.path(mode, 'dataset'), mode, root_pc)
 
-def semitone_offset(from_scale: str, to_scale: str) -> int:
-    src = NOTE_TO_SEMITONE[SCALE_DEGREES[from_scale][0]]
-    tgt = NOTE_TO_SEMITONE[SCALE_DEGREES[to_scale][0]]
-    diff = (tgt - src) % 12
-    return diff if diff <= 6 else diff - 12
+def preload_pipelines() -> dict:
+    """
+    Carga modelos, scalers e índices de semillas de ambos modos.
+    """
+    registry.preload()
+    for mode in MODES:
+        load_seed_index(mode)
+    return pipelines_report()
 
-# —————————————————————————————————————————————————————————————————————————
-def load_pipeline(scale_type: str):
+def model_version() -> str:
     """
-    Carga el modelo LSTM y scalers para 'minor' o 'major',
-    así como el JSON de datos correspondiente.
+    Identifica todo lo que influye en el resultado para una misma seed.
     """
-    if scale_type == 'major':
-        model_path   = os.path.join(AI_DIR, 'melody_model_happy.h5')
-        note_scl_p   = os.path.join(AI_DIR, 'note_scaler_happy.pkl')
-        dur_scl_p    = os.path.join(AI_DIR, 'duration_scaler_happy.pkl')
-        vel_scl_p    = os.path.join(AI_DIR, 'velocity_scaler_happy.pkl')
-        data_json    = os.path.join(AI_DIR, 'happy_midi_data.json')
-    else:
-        model_path   = os.path.join(AI_DIR, 'melody_model.h5')
-        note_scl_p   = os.path.join(AI_DIR, 'note_scaler.pkl')
-        dur_scl_p    = os.path.join(AI_DIR, 'duration_scaler.pkl')
-        vel_scl_p    = os.path.join(AI_DIR, 'velocity_scaler.pkl')
-        data_json    = os.path.join(AI_DIR, 'sad_midi_data.json')
-
-    melody_model      = tf.keras.models.load_model(model_path)
-    note_scaler       = pickle.load(open(note_scl_p, 'rb'))
-    duration_scaler   = pickle.load(open(dur_scl_p,  'rb'))
-    velocity_scaler   = pickle.load(open(vel_scl_p,  'rb'))
-    return melody_model, note_scaler, duration_scaler, velocity_scaler, data_json
+    return f"{registry.files_digest()}-{registry.backend}-{DECODING}"
+
+def pipelines_report() -> dict:
+    report = registry.report()
+    for mode in report:
+        report[mode]['seed_events'] = len(load_seed_index(mode))
+    return report
 
 # —————————————————————————————————————————————————————————————————————————
 def build_triad_chords(
     target_scale: str,
-    length: int = 4
+    length: int = 4,
+    rng: random.Random = None
 ) -> Tuple[List[List[int]], List[int], List[int]]:
-    prog       = random.choice(PROGRESSIONS)
+    rng        = rng or random
+    prog       = rng.choice(PROGRESSIONS)
     degrees    = [prog[i % len(prog)] for i in range(length)]
-    pattern    = random.choice(DURATION_PATTERNS)
+    pattern    = rng.choice(DURATION_PATTERNS)
     chord_durs = [d * TICKS_PER_BEAT for d in pattern]
 
     ext_types = ['triad', '7th']
     weights   = [0.65, 0.35]
-    ext_flags = random.choices(ext_types, weights=weights, k=length)
+    ext_flags = rng.choices(ext_types, weights=weights, k=length)
 
-    notes = SCALE_DEGREES[target_scale]
     chords, vels = [], []
-
     for deg, ext in zip(degrees, ext_flags):
-        root_name  = notes[deg]
-        third_name = notes[(deg+2) % 7]
-        fifth_name = notes[(deg+4) % 7]
-
-        root_pc  = NOTE_TO_SEMITONE[root_name]
-        third_pc = NOTE_TO_SEMITONE[third_name]
-        fifth_pc = NOTE_TO_SEMITONE[fifth_name]
-
-        root_3rd = clamp_to_range(root_pc + 36)
-        root_4th = clamp_to_range(root_pc + 48)
-        root_5th = clamp_to_range(root_pc + 60)
-
-        third_5th = clamp_to_range(root_5th + ((third_pc - root_pc) % 12))
-        fifth_5th = clamp_to_range(root_5th + ((fifth_pc - root_pc) % 12))
-
-        chord_notes = [root_3rd, root_4th, root_5th, third_5th, fifth_5th]
-
-        if ext == '7th':
-            sev_name = notes[(deg+6) % 7]
-            sev_pc   = NOTE_TO_SEMITONE[sev_name]
-            sev_5th  = clamp_to_range(root_5th + ((sev_pc - root_pc) % 12))
-            chord_notes.append(sev_5th)
-
-        chords.append(chord_notes)
-        vels.append(random.randint(63, 95))
+        chords.append(list(chord_voicing(target_scale, deg, ext == '7th')))
+        vels.append(rng.randint(63, 95))
 
     return chords, chord_durs, vels
 
 # —————————————————————————————————————————————————————————————————————————
 def generate_melody(
     target_scale: str,
-    length: int = 8
+    length: int = 8,
+    rng: random.Random = None
 ) -> Tuple[List[int], List[int], List[int]]:
     """
     Genera una melodía LSTM ajustada al target_scale.
     Detecta major vs minor y carga el pipeline correspondiente.
     """
+    return generate_melodies([target_scale], length, rng)[0]
+
+def generate_melodies(
+    target_scales: List[str],
+    length: int = 8,
+    rng: random.Random = None
+) -> List[Tuple[List[int], List[int], List[int]]]:
+    """
+    Genera una melodía por cada escala de target_scales con una única
+    inferencia por lotes (todas las escalas deben ser del mismo modo).
+    """
+    results = [([], [], []) for _ in target_scales]
+    for step in iter_melody_steps(target_scales, length, rng):
+        for (note, dur, vel), (melody, mdurs, mvels) in zip(step, results):
+            melody.append(note)
+            mdurs.append(dur)
+            mvels.append(vel)
+    return results
+
+def iter_melody_steps(
+    target_scales: List[str],
+    length: int = 8,
+    rng: random.Random = None
+) -> Iterator[List[Tuple[int, int, int]]]:
+    """
+    Igual que generate_melodies, pero entrega cada paso en cuanto se genera:
+    una lista con (note, duration, velocity) por escala.
+    El rng es el de quien llama: con una seed, la melodía de cada escala
+    es reproducible; sin ella, las peticiones agrupadas por RequestBatcher
+    comparten la inferencia por lotes de cada paso.
+    """
     # Determinar modo
-    mode = 'major' if target_scale.endswith('MAJOR') else 'minor'
-    model, note_scaler, duration_scaler, velocity_scaler, data_json = load_pipeline(mode)
-
-    # Cargar datos preprocesados
-    with open(data_json, 'r') as f:
-        data = json.load(f)
-
-    # Filtrar eventos del mismo modo
-    candidates = [
-        (scale, note_dict)
-        for scale, content in data.items()
-        for note_dict in content.get('melodias', [])
-        if (mode == 'minor' and scale.endswith('MINOR'))
-           or (mode == 'major' and scale.endswith('MAJOR'))
-    ]
-    random.shuffle(candidates)
-    seed_notes = candidates[:3]
-
-    # Semitone offset y preparar semilla
-    seed = []
-    for base_scale, m in seed_notes:
-        offset = semitone_offset(base_scale, target_scale)
-        seed.append({
-            'note':     m['note'] + offset,
-            'duration': m['duration'],
-            'velocity': m['velocity']
-        })
-
-    # Crear secuencia de contexto (16 pasos)
-    seq = [[s['note'], s['duration'], s['velocity']] for s in seed]
+    modes = {'major' if t.endswith('MAJOR') else 'minor' for t in target_scales}
+    if len(modes) != 1:
+        raise ValueError("Todas las escalas del lote deben ser del mismo modo")
+    mode = modes.pop()
+    pipeline = registry.get(mode)
+    scaling  = pipeline.scaling
+    scale_ids = np.array([SCALE_INDEX[t] for t in target_scales])
+
+    # Semilla: 3 eventos al azar del índice, transpuestos a la tónica destino
+    seed_index = load_seed_index(mode)
     CONTEXT = 16
-    if len(seq) < CONTEXT:
-        padding = [[0.0,0.0,0.0]] * (CONTEXT - len(seq))
-        seq_padded = padding + seq
-    else:
-        seq_padded = seq[-CONTEXT:]
+    rows = []
+    for target_scale in target_scales:
+        target_pc = root_semitone(target_scale)
+        seq       = seed_index.sample(target_pc, k=3, rng=rng or random)
+
+        # Crear secuencia de contexto (16 pasos)
+        if len(seq) < CONTEXT:
+            padding = [[0.0,0.0,0.0]] * (CONTEXT - len(seq))
+            rows.append(padding + seq)
+        else:
+            rows.append(seq[-CONTEXT:])
 
-    input_seq = np.array([seq_padded], dtype=np.float32)  # (1,16,3)
+    input_seq = np.array(rows, dtype=np.float32)  # (B,16,3)
 
-    melody, mdurs, mvels = [], [], []
-    for _ in range(length):
-        pn, pd, pv = model.predict(input_seq, verbose=0)[0]
-        note_int = int(round(note_scaler.inverse_transform([[pn]])[0][0]))
-        dur_int  = max(1, int(round(duration_scaler.inverse_transform([[pd]])[0][0])))
-        vel_int  = int(round(velocity_scaler.inverse_transform([[pv]])[0][0]))
-
-        # Ajuste al semitono más cercano en la escala
-        if is_semitone_in_scale(note_int, target_scale):
-            final_note = note_int
-        else:
-            base    = note_int % 12
-            sems    = [NOTE_TO_SEMITONE[n] for n in SCALE_DEGREES[target_scale]]
-            nearest = min(sems, key=lambda s: abs(s-base))
-            final_note = (note_int // 12)*12 + nearest
+    # Modo incremental: se consume el contexto una vez y después cada nota
+    # cuesta un solo paso de la LSTM (requiere MELODY_BACKEND=numpy)
+    incremental = DECODING == 'incremental' and hasattr(pipeline.model, 'step')
+    if incremental:
+        preds, states = pipeline.model.prime(input_seq)
 
-        melody.append(final_note)
-        mdurs.append(dur_int)
-        mvels.append(vel_int)
+    for i in range(length):
+        if not incremental:
+            preds = pipeline.model.predict(input_seq, verbose=0)
 
-        # Slide window
-        new_scaled = np.hstack([
-            note_scaler.transform([[final_note]]),
-            duration_scaler.transform([[dur_int]]),
-            velocity_scaler.transform([[vel_int]])
-        ]).reshape(1,1,3)
-        input_seq = np.concatenate([input_seq[:,1:,:], new_scaled], axis=1)
+        # Desescalado de todo el lote (idéntico a inverse_transform de sklearn)
+        raw      = np.rint(scaling.inverse(preds)).astype(np.int64)
+        # Ajuste al semitono más cercano en la escala (tabla precalculada)
+        notes    = snap_notes(raw[:, 0], scale_ids)
+        durs     = np.maximum(raw[:, 1], 1)
+        vels     = raw[:, 2]
+        step     = list(zip(notes.tolist(), durs.tolist(), vels.tolist()))
+        new_scaled = scaling.forward(np.stack([notes, durs, vels], axis=1))
 
-    return melody, mdurs, mvels
+        yield step
+
+        # Slide window
+        if incremental:
+            if i < length - 1:
+                preds, states = pipeline.model.step(new_scaled, states)
+        else:
+            input_seq = np.concatenate([input_seq[:,1:,:], new_scaled[:,None,:]], axis=1)
 
 # —————————————————————————————————————————————————————————————————————————
-def create_midi_file(
+def render_midi(
     chords, chord_durs, chord_vels,
     melody, mel_durs, mel_vels,
-    output_path='generated_music.mid'
-):
-    # … (idéntico al original) …
+    rng: random.Random = None
+) -> bytes:
+    """
+    Construye el MIDI de acordes + melodía y devuelve sus bytes, sin tocar disco.
+    """
     total_chord = sum(chord_durs)
     total_mel   = sum(mel_durs)
     scale_f     = total_chord / total_mel if total_mel > 0 else 1.0
     mel_durs    = [max(1, int(d * scale_f)) for d in mel_durs]
 
-    events, abs_time = [], 0
-    # Acordes
-    for chord, dur, _ in zip(chords, chord_durs, chord_vels):
-        for note in chord:
-            note_up = clamp_to_range(note + 12)
-            vel     = random.randint(63, 80)
-            events.append((abs_time, Message('note_on',  note=note_up, velocity=vel)))
-            events.append((abs_time + dur, Message('note_off', note=note_up, velocity=vel)))
-        abs_time += dur
-
-    # Melodía
-    abs_time = 0
-    for n, dur, _ in zip(melody, mel_durs, mel_vels):
-        nm  = clamp_to_range(n)
-        vel = random.randint(53, 70)
-        events.append((abs_time,         Message('note_on',  note=nm, velocity=vel)))
-        events.append((abs_time + dur,   Message('note_off', note=nm, velocity=vel)))
-        abs_time += dur
-
-    # Ordenar y convertir a delta-times
-    events.sort(key=lambda x: x[0])
-    mid   = MidiFile(ticks_per_beat=TICKS_PER_BEAT)
-    track = MidiTrack(); mid.tracks.append(track)
-    last_time = 0
-    for abs_t, msg in events:
-        msg.time = abs_t - last_time
-        track.append(msg)
-        last_time = abs_t
-
-    mid.save(output_path)
+    # Se respetan las longitudes de los zip originales
+    n_chords = min(len(chords), len(chord_durs), len(chord_vels))
+    n_mel    = min(len(melody), len(mel_durs), len(mel_vels))
+    return write_midi(
+        chords[:n_chords], chord_durs[:n_chords],
+        melody[:n_mel], mel_durs[:n_mel],
+        TICKS_PER_BEAT, clamp_to_range, rng or random
+    )
+
+def create_midi_file(
+    chords, chord_durs, chord_vels,
+    melody, mel_durs, mel_vels,
+    output_path='generated_music.mid',
+    rng: random.Random = None
+):
+    data = render_midi(chords, chord_durs, chord_vels, melody, mel_durs, mel_vels, rng)
+    with open(output_path, 'wb') as f:
+        f.write(data)
     print(f'✅ Música guardada en {output_path}')
+    return data
 
 # —————————————————————————————————————————————————————————————————————————
-def generate_music(
-    scale: str,
-    output_path: str = 'generated_music.mid'
-):
+def normalize_scale(scale: str) -> str:
     target = scale.upper()
     if not target.endswith(('MINOR','MAJOR')):
         target = f"{target}MINOR"
+    return target
+
+def generate_music(
+    scale: str,
+    output_path: str = 'generated_music.mid',
+    seed: int = None
+) -> bytes:
+    """
+    Genera acordes + melodía y devuelve los bytes del MIDI.
+    Si output_path es None no se escribe nada en disco.
+    Con la misma seed (y el mismo modelo) el resultado es idéntico.
+    """
+    target = normalize_scale(scale)
+    rng = random.Random(seed) if seed is not None else None
+
+    chords, cdurs, cvels = build_triad_chords(target, rng=rng)
+    melody, mdurs, mvels = generate_melody(target, rng=rng)
+    if output_path is None:
+        return render_midi(chords, cdurs, cvels, melody, mdurs, mvels, rng)
+    return create_midi_file(chords, cdurs, cvels, melody, mdurs, mvels, output_path, rng)
+
+def generate_music_batch(scales: List[str]) -> List[bytes]:
+    """
+    Genera un MIDI por escala. Las melodías salen de una sola inferencia
+    por lotes, así que todas las escalas deben ser del mismo modo.
+    """
+    targets  = [normalize_scale(s) for s in scales]
+    chords   = [build_triad_chords(t) for t in targets]
+    melodies = generate_melodies(targets)
+    return [
+        render_midi(*chord_part, *melody_part)
+        for chord_part, melody_part in zip(chords, melodies)
+    ]
+
+def iter_music_events(scale: str, length: int = 8) -> Iterator[Tuple[str, object]]:
+    """
+    Genera acordes + melodía entregando cada evento en cuanto existe:
+    ('chord', {...}) por acorde, ('note', {...}) por nota de la melodía y,
+    al final, ('midi', bytes) con el archivo completo.
+    Las duraciones de 'note' son las del modelo; el MIDI final las reescala
+    para que la melodía ocupe lo mismo que los acordes.
+    """
+    target = normalize_scale(scale)
 
     chords, cdurs, cvels = build_triad_chords(target)
-    melody, mdurs, mvels = generate_melody(target)
-    create_midi_file(chords, cdurs, cvels, melody, mdurs, mvels, output_path)
+    start = 0
+    for notes, dur, vel in zip(chords, cdurs, cvels):
+        yield 'chord', {'notes': notes, 'start': start, 'duration': dur, 'velocity': vel}
+        start += dur
+
+    melody, mdurs, mvels = [], [], []
+    for i, step in enumerate(iter_melody_steps([target], length)):
+        note, dur, vel = step[0]
+        melody.append(note)
+        mdurs.append(dur)
+        mvels.append(vel)
+        yield 'note', {'index': i, 'note': note, 'duration': dur, 'velocity': vel}
+
+    yield 'midi', render_midi(chords, cdurs, cvels, melody, mdurs, mvels)
@@ -0,0 +1,156 @@
+# backend/melody_reserve.py
+
+import asyncio
+import os
+import time
+from collections import deque
+
+from backend.generate_music import generate_music_batch, SCALE_DEGREES
+from backend.worker_pool import pool
+
+# —————————————————————————————————————————————————————————————————————————
+# Configuración (variables de entorno)
+MELODY_RESERVE_SIZE     = int(os.environ.get('MELODY_RESERVE_SIZE', '4'))
+MELODY_RESERVE_CHUNK    = int(os.environ.get('MELODY_RESERVE_CHUNK', '16'))
+MELODY_RESERVE_IDLE_MS  = float(os.environ.get('MELODY_RESERVE_IDLE_MS', '50'))
+MELODY_RESERVE_BACKOFF_S = float(os.environ.get('MELODY_RESERVE_BACKOFF_S', '60'))
+
+# —————————————————————————————————————————————————————————————————————————
+class MelodyReserve:
+    """
+    Reserva de MIDIs ya generados para cada una de las escalas de
+    scale_degrees.json. Las peticiones anónimas sin seed toman uno al
+    instante; una tarea en segundo plano la rellena solo cuando el pool
+    de generación está ocioso.
+    """
+    def __init__(self, size: int = MELODY_RESERVE_SIZE,
+                 chunk: int = MELODY_RESERVE_CHUNK,
+                 idle_ms: float = MELODY_RESERVE_IDLE_MS,
+                 scales=None):
+        self.size     = size
+        self.chunk    = chunk
+        self.idle_ms  = idle_ms
+        self.scales   = list(scales or SCALE_DEGREES)
+        self._items   = {s: deque() for s in self.scales}
+        self._short_since = {s: time.monotonic() for s in self.scales}
+        self._backoff = {}
+        self._task    = None
+        self.hits     = 0
+        self.misses   = 0
+        self.produced = 0
+        self.failed   = 0
+        self.refills  = 0
+        self.lag_total = 0.0
+        self.lag_max   = 0.0
+
+    # ——— Consumo ———
+    def pop(self, scale: str):
+        """
+        Devuelve un MIDI de la reserva de `scale` o None si está vacía.
+        """
+        items = self._items.get(scale)
+        if not items:
+            self.misses += 1
+            return None
+        data = items.popleft()
+        self.hits += 1
+        if len(items) == self.size - 1:
+            self._short_since[scale] = time.monotonic()
+        return data
+
+    # ——— Relleno ———
+    def _deficits(self):
+        now = time.monotonic()
+        return [
+            s for s in sorted(self.scales, key=lambda s: len(self._items[s]))
+            if len(self._items[s]) < self.size and self._backoff.get(s, 0) <= now
+        ]
+
+    def _next_batch(self):
+        """
+        Escalas a generar en la próxima inferencia: todas del mismo modo
+        (requisito de generate_music_batch), empezando por la más vacía.
+        """
+        deficits = self._deficits()
+        if not deficits:
+            return []
+        mode  = deficits[0][-5:]
+        batch = []
+        for s in deficits:
+            if s[-5:] != mode:
+                continue
+            batch.extend([s] * (self.size - len(self._items[s])))
+        return batch[:self.chunk]
+
+    async def _fill_once(self, scales) -> None:
+        try:
+            midis = await pool.run(generate_music_batch, scales)
+        except Exception as e:
+            self.failed += 1
+            if len(set(scales)) == 1:
+                print(f"⚠️ Reserva: no se pudo generar {scales[0]}: {e}")
+                self._backoff[scales[0]] = time.monotonic() + MELODY_RESERVE_BACKOFF_S
+            else:
+                # Reintentar escala por escala para aislar la que falla
+                for s in dict.fromkeys(scales):
+                    await self._fill_once([s])
+            return
+        now = time.monotonic()
+        for s, data in zip(scales, midis):
+            items = self._items[s]
+            if len(items) >= self.size:
+                continue
+            items.append(data)
+            self.produced += 1
+            if len(items) == self.size:
+                lag = now - self._short_since[s]
+                self.refills   += 1
+                self.lag_total += lag
+                self.lag_max    = max(self.lag_max, lag)
+
+    async def _run(self):
+        while True:
+            # Solo se genera con el pool ocioso para no competir con peticiones
+            batch = self._next_batch() if pool.pending == 0 else []
+            if not batch:
+                await asyncio.sleep(self.idle_ms / 1000.0)
+                continue
+            await self._fill_once(batch)
+
+    def start(self):
+        if self.size > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        now      = time.monotonic()
+        short    = [s for s in self.scales if len(self._items[s]) < self.size]
+        return {
+            'size':          self.size,
+            'scales':        len(self.scales),
+            'stored':        sum(len(q) for q in self._items.values()),
+            'hits':          self.hits,
+            'misses':        self.misses,
+            'hit_rate':      round(self.hits / requests, 3) if requests else 0.0,
+            'produced':      self.produced,
+            'failed':        self.failed,
+            'refills':       self.refills,
+            'avg_refill_lag_s': round(self.lag_total / self.refills, 3)
+                                if self.refills else 0.0,
+            'max_refill_lag_s': round(self.lag_max, 3),
+            'current_lag_s': round(max((now - self._short_since[s] for s in short),
+                                       default=0.0), 3),
+            'short_scales':  short,
+            'backoff':       sorted(s for s, t in self._backoff.items() if t > now),
+        }
+
+reserve = MelodyReserve()
@@ -0,0 +1,201 @@
+# backend/melody_store.py
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from backend.db import get_connection, transaction, writer
+
+# —————————————————————————————————————————————————————————————————————————
+# Configuración (variables de entorno)
+MIS_MELODIAS_DIR     = os.environ.get('MIS_MELODIAS_DIR', 'ai/mis_melodias')
+STORE_RETENTION_S    = float(os.environ.get('STORE_RETENTION_S', str(24 * 3600)))
+STORE_GC_INTERVAL_S  = float(os.environ.get('STORE_GC_INTERVAL_S', '3600'))
+
+# —————————————————————————————————————————————————————————————————————————
+class MelodyStore:
+    """
+    Almacén direccionado por contenido de las melodías de los usuarios:
+    cada MIDI se guarda una sola vez en objects/ab/cd/<sha256>.mid y las
+    filas de mis_melodias apuntan a su hash. La existencia de cada archivo
+    se registra en la tabla blobs, sin consultar el disco por fila.
+    """
+    def __init__(self, root: str = MIS_MELODIAS_DIR,
+                 retention_s: float = STORE_RETENTION_S):
+        self.root        = root
+        self.objects     = os.path.join(root, 'objects')
+        self.retention_s = retention_s
+        # save() y gc() no se solapan: un blob reutilizado no puede
+        # borrarse entre la comprobación y el alta de su referencia
+        self._lock       = threading.Lock()
+        self.written     = 0
+        self.deduped     = 0
+        os.makedirs(self.objects, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.objects, sha256[:2], sha256[2:4], f"{sha256}.mid")
+
+    def _write(self, sha256: str, data: bytes) -> bool:
+        """
+        Escribe el blob si no existe (temporal + os.replace). True si se escribió.
+        """
+        dest = self.path(sha256)
+        if os.path.exists(dest):
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix='tmp_', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, dest)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return True
+
+    def save(self, username: str, midi_name: str, data: bytes) -> str:
+        """
+        Guarda la melodía de un usuario y devuelve su hash. Las filas se
+        escriben a través del escritor único de la BD.
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if self._write(sha256, data):
+                self.written += 1
+            else:
+                self.deduped += 1
+            # creado se renueva al reutilizar el blob para que el GC no lo
+            # considere huérfano antes de que se confirme la nueva fila
+            writer.submit(
+                "INSERT INTO blobs (sha256, bytes, creado) VALUES (?, ?, ?) "
+                "ON CONFLICT(sha256) DO UPDATE SET creado = excluded.creado",
+                (sha256, len(data), time.time())
+            )
+            writer.submit(
+                "INSERT INTO mis_melodias (username, midi_name, sha256) VALUES (?, ?, ?)",
+                (username, midi_name, sha256)
+            )
+        return sha256
+
+    def list_names(self, username: str) -> list:
+        return [r[0] for r in get_connection().execute(
+            "SELECT m.midi_name FROM mis_melodias m JOIN blobs b ON b.sha256 = m.sha256 "
+            "WHERE m.username = ? ORDER BY m.id", (username,)
+        )]
+
+    def resolve(self, username: str, midi_name: str):
+        """
+        (pertenece al usuario, ruta del blob o None si no hay archivo).
+        """
+        row = get_connection().execute(
+            "SELECT m.sha256, b.sha256 FROM mis_melodias m "
+            "LEFT JOIN blobs b ON b.sha256 = m.sha256 "
+            "WHERE m.username = ? AND m.midi_name = ?", (username, midi_name)
+        ).fetchone()
+        if row is None:
+            return False, None
+        return True, self.path(row[1]) if row[1] else None
+
+    # ——— Migración del directorio plano ———
+    def import_legacy(self) -> int:
+        """
+        Pasa al almacén los archivos planos de mis_melodias que tienen fila
+        (una sola vez: después sus filas ya tienen hash).
+        """
+        rows = get_connection().execute(
+            "SELECT id, midi_name FROM mis_melodias WHERE sha256 IS NULL"
+        ).fetchall()
+        imported = 0
+        for row_id, midi_name in rows:
+            flat = os.path.join(self.root, midi_name)
+            if not os.path.isfile(flat):
+                continue
+            with open(flat, 'rb') as f:
+                data = f.read()
+            sha256 = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                self._write(sha256, data)
+                with transaction() as conn:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO blobs (sha256, bytes, creado) VALUES (?, ?, ?)",
+                        (sha256, len(data), time.time())
+                    )
+                    conn.execute("UPDATE mis_melodias SET sha256 = ? WHERE id = ?", (sha256, row_id))
+            os.remove(flat)
+            imported += 1
+        if imported:
+            print(f"📦 {imported} melodías movidas al almacén por contenido")
+        return imported
+
+    # ——— Recolección de basura ———
+    def gc(self, now: float = None, tmp_dirs=()) -> dict:
+        """
+        Borra, pasada la retención: temporales tmp_*.part de mkstemp
+        abandonados (también en tmp_dirs), archivos planos sin fila (melodías anónimas antiguas)
+        y blobs sin referencias.
+        """
+        now    = time.time() if now is None else now
+        cutoff = now - self.retention_s
+        removed = {'tmp': 0, 'anonymous': 0, 'blobs': 0}
+
+        for top in (self.root, *tmp_dirs):
+            for dirpath, _, files in os.walk(top):
+                for name in files:
+                    # solo el patrón de mkstemp: una subida legítima acaba en .mid
+                    if (name.startswith('tmp_') and name.endswith('.part')
+                            and self._remove_if_older(os.path.join(dirpath, name), cutoff)):
+                        removed['tmp'] += 1
+
+        referenced = {r[0] for r in get_connection().execute("SELECT midi_name FROM mis_melodias")}
+        for name in os.listdir(self.root):
+            full = os.path.join(self.root, name)
+            if (name.endswith('.mid') and name not in referenced
+                    and self._remove_if_older(full, cutoff)):
+                removed['anonymous'] += 1
+
+        with self._lock:
+            # Todo lo encolado queda confirmado antes de buscar huérfanos
+            writer.flush()
+            with transaction() as conn:
+                orphans = [r[0] for r in conn.execute(
+                    "SELECT sha256 FROM blobs b WHERE creado < ? AND NOT EXISTS "
+                    "(SELECT 1 FROM mis_melodias m WHERE m.sha256 = b.sha256)", (cutoff,)
+                )]
+                conn.executemany("DELETE FROM blobs WHERE sha256 = ?", [(s,) for s in orphans])
+            for sha256 in orphans:
+                try:
+                    os.remove(self.path(sha256))
+                except FileNotFoundError:
+                    pass
+            removed['blobs'] = len(orphans)
+
+        if any(removed.values()):
+            print(f"🧹 GC del almacén: {removed}")
+        return removed
+
+    @staticmethod
+    def _remove_if_older(path: str, cutoff: float) -> bool:
+        # Borra el archivo si su última modificación es anterior a cutoff
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                return True
+        except FileNotFoundError:
+            pass
+        return False
+
+    def stats(self) -> dict:
+        blobs, total = get_connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM blobs"
+        ).fetchone()
+        return {
+            'blobs':       blobs,
+            'bytes':       total,
+            'written':     self.written,
+            'deduped':     self.deduped,
+            'retention_s': self.retention_s,
+        }
+
+store = MelodyStore()
@@ -0,0 +1,63 @@
+# backend/midi_metadata.py
+
+import io
+
+import numpy as np
+from mido import MidiFile
+
+from backend.music_theory import SCALES, root_semitone
+
+# —————————————————————————————————————————————————————————————————————————
+# Metadatos de un MIDI subido: duración, notas, pistas y tonalidad estimada.
+# Se calculan una sola vez al subirlo y se guardan en el catálogo.
+
+# Perfiles de Krumhansl-Kessler (tónica en la posición 0)
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# Nombre de escala (como en scale_degrees.json) por tónica y modo
+KEY_NAMES = {}
+for _s in SCALES:
+    KEY_NAMES.setdefault((root_semitone(_s), _s[-5:]), _s)
+
+DRUM_CHANNEL = 9
+
+def detect_key(pc_weights) -> str:
+    """
+    Escala con mayor correlación entre el histograma de clases de altura
+    (ponderado por duración) y los perfiles rotados; None si no hay notas.
+    """
+    w = np.asarray(pc_weights, dtype=np.float64)
+    if not w.any():
+        return None
+    best, best_r = None, -np.inf
+    for mode, profile in (('MAJOR', MAJOR_PROFILE), ('MINOR', MINOR_PROFILE)):
+        for root in range(12):
+            r = np.corrcoef(w, np.roll(profile, root))[0, 1]
+            if r > best_r and (root, mode) in KEY_NAMES:
+                best, best_r = KEY_NAMES[(root, mode)], r
+    return best
+
+def extract_metadata(data: bytes) -> dict:
+    mid = MidiFile(file=io.BytesIO(data))
+    pc_weights = np.zeros(12)
+    notes = 0
+    for track in mid.tracks:
+        abs_t, active = 0, {}
+        for msg in track:
+            abs_t += msg.time
+            if msg.type not in ('note_on', 'note_off') or msg.channel == DRUM_CHANNEL:
+                continue
+            key = (msg.channel, msg.note)
+            if msg.type == 'note_on' and msg.velocity > 0:
+                notes += 1
+                active.setdefault(key, []).append(abs_t)
+            elif active.get(key):
+                start = active[key].pop(0)
+                pc_weights[msg.note % 12] += max(1, abs_t - start)
+    return {
+        'duracion': round(mid.length, 3),
+        'notas':    notes,
+        'pistas':   len(mid.tracks),
+        'tonalidad': detect_key(pc_weights),
+    }
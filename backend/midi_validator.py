@@ -0,0 +1,96 @@
+# backend/midi_validator.py
+
+import struct
+
+# —————————————————————————————————————————————————————————————————————————
+# Validación incremental de la estructura de un Standard MIDI File a medida
+# que llegan los bytes: cabecera MThd y, después, chunks con tipo de cuatro
+# letras y longitud. Los datos de cada chunk no se guardan, solo se cuentan.
+
+class InvalidMidi(ValueError):
+    """Los bytes recibidos no son un archivo MIDI válido."""
+
+class MidiTooLarge(InvalidMidi):
+    """El archivo (o un chunk declarado) supera el tamaño máximo."""
+
+class MidiStreamValidator:
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes
+        self._buf      = b''      # cabecera de chunk pendiente de completar
+        self._skip     = 0        # bytes de datos que faltan del chunk actual
+        self.received  = 0
+        self.format    = None
+        self.ntrks     = None
+        self.division  = None
+        self.tracks    = 0
+
+    def feed(self, data: bytes):
+        """
+        Procesa el siguiente trozo. Lanza InvalidMidi en cuanto la
+        estructura deja de ser válida.
+        """
+        if self.max_bytes is not None and self.received + len(data) > self.max_bytes:
+            raise MidiTooLarge(f"El archivo supera el máximo de {self.max_bytes} bytes")
+        pos = 0
+        while pos < len(data):
+            if self._skip:
+                n = min(self._skip, len(data) - pos)
+                self._skip -= n
+                pos += n
+                self.received += n
+                continue
+            need = (14 if self.format is None else 8) - len(self._buf)
+            piece = data[pos:pos + need]
+            self._buf += piece
+            pos += len(piece)
+            self.received += len(piece)
+            if self.format is None:
+                # Se rechaza en cuanto los primeros bytes no son 'MThd'
+                if not b'MThd'.startswith(self._buf[:4]):
+                    raise InvalidMidi("Falta la cabecera MThd")
+                if len(self._buf) == 14:
+                    self._header(self._buf)
+                    self._buf = b''
+            elif len(self._buf) == 8:
+                self._chunk(self._buf)
+                self._buf = b''
+
+    def _header(self, buf: bytes):
+        length, fmt, ntrks, division = struct.unpack('>IHHH', buf[4:14])
+        if length < 6:
+            raise InvalidMidi("Cabecera MThd demasiado corta")
+        if fmt not in (0, 1, 2):
+            raise InvalidMidi(f"Formato MIDI desconocido: {fmt}")
+        if ntrks == 0 or (fmt == 0 and ntrks != 1):
+            raise InvalidMidi(f"Número de pistas no válido: {ntrks}")
+        if division == 0:
+            raise InvalidMidi("División temporal no válida")
+        self.format, self.ntrks, self.division = fmt, ntrks, division
+        self._skip = length - 6
+
+    def _chunk(self, buf: bytes):
+        kind, length = buf[:4], struct.unpack('>I', buf[4:])[0]
+        if not all(0x20 <= b < 0x7f for b in kind):
+            raise InvalidMidi("Tipo de chunk no válido")
+        if kind == b'MTrk':
+            self.tracks += 1
+            if self.tracks > self.ntrks:
+                raise InvalidMidi("Hay más pistas de las declaradas en MThd")
+            if length == 0:
+                raise InvalidMidi("Pista MTrk vacía")
+        # Un chunk que no cabe en el máximo permitido se rechaza sin esperar
+        if self.max_bytes is not None and self.received + length > self.max_bytes:
+            raise MidiTooLarge("El chunk declarado supera el tamaño máximo")
+        self._skip = length
+
+    def close(self):
+        """
+        Comprueba que el archivo terminó en un límite de chunk y que están
+        todas las pistas declaradas.
+        """
+        if self.format is None:
+            raise InvalidMidi("Archivo incompleto: falta la cabecera")
+        if self._skip or self._buf:
+            raise InvalidMidi("Archivo truncado")
+        if self.tracks != self.ntrks:
+            raise InvalidMidi(f"Se declararon {self.ntrks} pistas y hay {self.tracks}")
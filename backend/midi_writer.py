@@ -0,0 +1,96 @@
+# backend/midi_writer.py
+
+import heapq
+import random
+import struct
+from typing import Iterable, Iterator, List, Tuple
+
+# —————————————————————————————————————————————————————————————————————————
+# Escritor MIDI en tiempo lineal: acordes y melodía se generan ya ordenados,
+# se mezclan en streaming y los delta-times se codifican directamente a bytes
+# (sin objetos mido.Message por nota ni events.sort).
+
+NOTE_ON  = 0x90
+NOTE_OFF = 0x80
+END_OF_TRACK = b'\x00\xff\x2f\x00'
+
+Event = Tuple[int, int, int, int]  # (tiempo absoluto, status, nota, velocidad)
+
+def encode_varlen(value: int) -> bytes:
+    """
+    Cantidad de longitud variable del formato SMF.
+    """
+    if value < 0:
+        raise ValueError('El delta-time no puede ser negativo')
+    buf = [value & 0x7f]
+    value >>= 7
+    while value:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    return bytes(reversed(buf))
+
+def chord_events(chords, chord_durs, velocities, clamp) -> Iterator[Event]:
+    abs_time, k = 0, 0
+    for chord, dur in zip(chords, chord_durs):
+        notes = [clamp(note + 12) for note in chord]
+        vels  = velocities[k:k + len(notes)]
+        k += len(notes)
+        for note, vel in zip(notes, vels):
+            yield abs_time, NOTE_ON, note, vel
+        for note, vel in zip(notes, vels):
+            yield abs_time + dur, NOTE_OFF, note, vel
+        abs_time += dur
+
+def melody_events(melody, mel_durs, velocities, clamp) -> Iterator[Event]:
+    abs_time = 0
+    for n, dur, vel in zip(melody, mel_durs, velocities):
+        nm = clamp(n)
+        yield abs_time, NOTE_ON, nm, vel
+        yield abs_time + dur, NOTE_OFF, nm, vel
+        abs_time += dur
+
+def encode_track(events: Iterable[Event]) -> bytes:
+    """
+    Codifica eventos ya ordenados por tiempo en un chunk MTrk (con running status).
+    """
+    data = bytearray()
+    last_time, running = 0, None
+    for abs_t, status, note, vel in events:
+        data += encode_varlen(abs_t - last_time)
+        if status != running:
+            data.append(status)
+            running = status
+        data.append(note)
+        data.append(vel)
+        last_time = abs_t
+    data += END_OF_TRACK
+    return b'MTrk' + struct.pack('>I', len(data)) + bytes(data)
+
+def write_midi(
+    chords: List[List[int]], chord_durs: List[int],
+    melody: List[int], mel_durs: List[int],
+    ticks_per_beat: int, clamp, rng=random,
+    separate_tracks: bool = False
+) -> bytes:
+    """
+    Devuelve los bytes del MIDI. Por defecto una sola pista con acordes y
+    melodía mezclados (mismo resultado que el escritor original con mido);
+    con separate_tracks=True, una pista por parte.
+    """
+    # Las velocidades se sortean en el mismo orden que antes (acordes y
+    # después melodía) para que una semilla dé siempre el mismo archivo
+    n_chord = sum(len(c) for c, _ in zip(chords, chord_durs))
+    n_mel   = min(len(melody), len(mel_durs))
+    chord_vels = [rng.randint(63, 80) for _ in range(n_chord)]
+    mel_vels   = [rng.randint(53, 70) for _ in range(n_mel)]
+
+    chord_ev = chord_events(chords, chord_durs, chord_vels, clamp)
+    mel_ev   = melody_events(melody, mel_durs, mel_vels, clamp)
+    if separate_tracks:
+        tracks = [encode_track(chord_ev), encode_track(mel_ev)]
+    else:
+        # heapq.merge es estable: a igual tiempo, los acordes van primero
+        tracks = [encode_track(heapq.merge(chord_ev, mel_ev, key=lambda e: e[0]))]
+
+    header = b'MThd' + struct.pack('>IHHH', 6, 1, len(tracks), ticks_per_beat)
+    return header + b''.join(tracks)
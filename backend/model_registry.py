@@ -0,0 +1,153 @@
+# backend/model_registry.py
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from backend.scaling import AffineScaling
+
+# —————————————————————————————————————————————————————————————————————————
+# Paths y configuración
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+AI_DIR   = os.path.join(BASE_DIR, '..', 'ai')
+
+MODES = ('minor', 'major')
+
+# Motor de inferencia: 'tensorflow' o 'numpy' (este último no importa TF)
+MELODY_BACKEND = os.environ.get('MELODY_BACKEND', 'tensorflow').lower()
+BACKENDS = ('tensorflow', 'numpy')
+
+PIPELINE_FILES = {
+    'major': {
+        'model':           'melody_model_happy.h5',
+        'note_scaler':     'note_scaler_happy.pkl',
+        'duration_scaler': 'duration_scaler_happy.pkl',
+        'velocity_scaler': 'velocity_scaler_happy.pkl',
+        'dataset':         'happy_midi_data.cols',
+    },
+    'minor': {
+        'model':           'melody_model.h5',
+        'note_scaler':     'note_scaler.pkl',
+        'duration_scaler': 'duration_scaler.pkl',
+        'velocity_scaler': 'velocity_scaler.pkl',
+        'dataset':         'sad_midi_data.cols',
+    },
+}
+
+# —————————————————————————————————————————————————————————————————————————
+def _files_of(path: str) -> list:
+    # Un conjunto columnar es un directorio: se recorren sus archivos en orden
+    if os.path.isdir(path):
+        return [os.path.join(path, n) for n in sorted(os.listdir(path))]
+    return [path]
+
+def _load_scaler(path: str):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def _load_model(path: str, backend: str):
+    if backend == 'numpy':
+        from backend.numpy_lstm import NumpyMelodyModel
+        return NumpyMelodyModel.from_h5(path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+class Pipeline:
+    """
+    Modelo LSTM + scalers de un modo ('minor' o 'major'), ya deserializados.
+    """
+    def __init__(self, mode, model, note_scaler, duration_scaler,
+                 velocity_scaler, dataset, load_seconds):
+        self.mode            = mode
+        self.model           = model
+        self.note_scaler     = note_scaler
+        self.duration_scaler = duration_scaler
+        self.velocity_scaler = velocity_scaler
+        self.dataset         = dataset
+        self.load_seconds    = load_seconds
+        # Coeficientes afines de los tres scalers, aplicados por lotes
+        self.scaling         = AffineScaling.from_scalers(
+            note_scaler, duration_scaler, velocity_scaler)
+
+    def as_tuple(self):
+        return (self.model, self.note_scaler, self.duration_scaler,
+                self.velocity_scaler, self.dataset)
+
+class ModelRegistry:
+    """
+    Registro de proceso: carga cada pipeline una sola vez y lo reutiliza
+    en todas las peticiones.
+    """
+    def __init__(self, ai_dir: str = AI_DIR, backend: str = MELODY_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Motor de inferencia desconocido: {backend}")
+        self.ai_dir     = ai_dir
+        self.backend    = backend
+        self._pipelines = {}
+        self._lock      = threading.Lock()
+        self._digest    = None
+
+    def path(self, mode: str, key: str) -> str:
+        return os.path.join(self.ai_dir, PIPELINE_FILES[mode][key])
+
+    def _load(self, mode: str) -> Pipeline:
+        start = time.perf_counter()
+        model = _load_model(self.path(mode, 'model'), self.backend)
+        note_scaler     = _load_scaler(self.path(mode, 'note_scaler'))
+        duration_scaler = _load_scaler(self.path(mode, 'duration_scaler'))
+        velocity_scaler = _load_scaler(self.path(mode, 'velocity_scaler'))
+        elapsed = time.perf_counter() - start
+        return Pipeline(mode, model, note_scaler, duration_scaler,
+                        velocity_scaler, self.path(mode, 'dataset'), elapsed)
+
+    def get(self, mode: str) -> Pipeline:
+        if mode not in PIPELINE_FILES:
+            raise ValueError(f"Modo desconocido: {mode}")
+        pipeline = self._pipelines.get(mode)
+        if pipeline is None:
+            with self._lock:
+                pipeline = self._pipelines.get(mode)
+                if pipeline is None:
+                    pipeline = self._load(mode)
+                    self._pipelines[mode] = pipeline
+        return pipeline
+
+    def preload(self, modes=MODES) -> dict:
+        """
+        Carga todos los modos indicados y devuelve el informe de carga.
+        """
+        for mode in modes:
+            pipeline = self.get(mode)
+            print(f"🧠 Pipeline '{mode}' cargado en {pipeline.load_seconds:.2f}s "
+                  f"({PIPELINE_FILES[mode]['model']}, motor {self.backend})")
+        return self.report()
+
+    def files_digest(self) -> str:
+        """
+        Huella del contenido de modelos, scalers y datos de ambos modos
+        (no necesita cargar nada en memoria).
+        """
+        if self._digest is None:
+            h = hashlib.sha256()
+            for mode in MODES:
+                for key in sorted(PIPELINE_FILES[mode]):
+                    for path in _files_of(self.path(mode, key)):
+                        with open(path, 'rb') as f:
+                            for block in iter(lambda: f.read(1 << 20), b''):
+                                h.update(block)
+            self._digest = h.hexdigest()[:16]
+        return self._digest
+
+    def report(self) -> dict:
+        return {
+            mode: {
+                'files':        dict(PIPELINE_FILES[mode]),
+                'backend':      self.backend,
+                'load_seconds': round(pipeline.load_seconds, 4),
+            }
+            for mode, pipeline in self._pipelines.items()
+        }
+
+registry = ModelRegistry()
@@ -0,0 +1,138 @@
+# backend/music_theory.py
+
+import json
+import os
+
+import numpy as np
+
+# —————————————————————————————————————————————————————————————————————————
+# Tablas de teoría musical construidas una sola vez a partir de
+# scale_degrees.json: ajuste a la escala por nota MIDI y voicings de
+# tríada y séptima para cada escala × grado.
+
+BASE_DIR     = os.path.dirname(os.path.abspath(__file__))
+AI_DIR       = os.path.join(BASE_DIR, '..', 'ai')
+DEGREES_PATH = os.path.join(AI_DIR, 'scale_degrees.json')
+
+LOWER_BOUND = 24   # C3
+UPPER_BOUND = 84   # C6
+
+with open(DEGREES_PATH, 'r') as f:
+    SCALE_DEGREES = json.load(f)
+
+# Incluye B# y F## (C#MAJOR y G#MAJOR los usan)
+NOTE_TO_SEMITONE = {
+    "C":0, "B#":0, "C#":1, "Db":1, "D":2, "D#":3, "Eb":3,
+    "E":4, "Fb":4, "F":5, "E#":5, "F#":6, "Gb":6,
+    "G":7, "F##":7, "G#":8, "Ab":8, "A":9, "A#":10,"Bb":10,
+    "B":11,"Cb":11
+}
+
+# —————————————————————————————————————————————————————————————————————————
+def clamp_to_range(n: int) -> int:
+    while n < LOWER_BOUND: n += 12
+    while n > UPPER_BOUND: n -= 12
+    return n
+
+def _nearest_pc(base: int, sems: list) -> int:
+    # Mismo criterio que el ajuste original: distancia sin dar la vuelta a
+    # la octava y, en caso de empate, el primer grado de la escala
+    if base in sems:
+        return base
+    return min(sems, key=lambda s: abs(s - base))
+
+def _voicing(sems: list, deg: int, seventh: bool) -> tuple:
+    root_pc  = sems[deg]
+    root_3rd = clamp_to_range(root_pc + 36)
+    root_4th = clamp_to_range(root_pc + 48)
+    root_5th = clamp_to_range(root_pc + 60)
+    chord = [root_3rd, root_4th, root_5th]
+    steps = (2, 4, 6) if seventh else (2, 4)
+    for step in steps:
+        pc = sems[(deg + step) % 7]
+        chord.append(clamp_to_range(root_5th + ((pc - root_pc) % 12)))
+    return tuple(chord)
+
+# —————————————————————————————————————————————————————————————————————————
+SCALES      = list(SCALE_DEGREES)
+SCALE_INDEX = {s: i for i, s in enumerate(SCALES)}
+
+# Semitonos de cada escala, en el orden de sus grados
+SCALE_SEMITONES = {s: [NOTE_TO_SEMITONE[n] for n in SCALE_DEGREES[s]] for s in SCALES}
+
+# Pertenencia por clase de altura: IN_SCALE[s][pc]
+IN_SCALE = {s: tuple(pc in sems for pc in range(12)) for s, sems in SCALE_SEMITONES.items()}
+
+# Clase de altura ajustada: PC_SNAP[s][pc]
+PC_SNAP = {s: tuple(_nearest_pc(pc, sems) for pc in range(12))
+           for s, sems in SCALE_SEMITONES.items()}
+
+# Ajuste de las 128 notas MIDI: SNAP_TABLE[s][n] (tupla) y SNAP_ARRAY[i, n]
+SNAP_TABLE = {s: tuple((n // 12) * 12 + PC_SNAP[s][n % 12] for n in range(128))
+              for s in SCALES}
+SNAP_ARRAY = np.array([SNAP_TABLE[s] for s in SCALES], dtype=np.int16)
+PC_SNAP_ARRAY = np.array([PC_SNAP[s] for s in SCALES], dtype=np.int16)
+
+# Voicings por escala y grado: TRIADS[s][deg] (5 notas), SEVENTHS[s][deg] (6 notas)
+TRIADS   = {s: tuple(_voicing(sems, d, False) for d in range(7))
+            for s, sems in SCALE_SEMITONES.items()}
+SEVENTHS = {s: tuple(_voicing(sems, d, True) for d in range(7))
+            for s, sems in SCALE_SEMITONES.items()}
+
+# —————————————————————————————————————————————————————————————————————————
+def is_semitone_in_scale(midi_note: int, scale: str) -> bool:
+    return IN_SCALE[scale][midi_note % 12]
+
+def snap_to_scale(midi_note: int, scale: str) -> int:
+    """
+    Nota de la escala más cercana (misma octava) a midi_note.
+    """
+    if 0 <= midi_note < 128:
+        return SNAP_TABLE[scale][midi_note]
+    return (midi_note // 12) * 12 + PC_SNAP[scale][midi_note % 12]
+
+def snap_notes(notes: np.ndarray, scale_ids: np.ndarray) -> np.ndarray:
+    """
+    Versión por lotes de snap_to_scale: una nota por índice de escala.
+    """
+    notes  = np.asarray(notes, dtype=np.int64)
+    inside = (notes >= 0) & (notes < 128)
+    table  = SNAP_ARRAY[scale_ids, np.clip(notes, 0, 127)]
+    return np.where(inside, table,
+                    (notes // 12) * 12 + PC_SNAP_ARRAY[scale_ids, notes % 12]).astype(np.int64)
+
+def chord_voicing(scale: str, degree: int, seventh: bool = False) -> tuple:
+    return (SEVENTHS if seventh else TRIADS)[scale][degree]
+
+def root_semitone(scale: str) -> int:
+    return SCALE_SEMITONES[scale][0]
+
+# —————————————————————————————————————————————————————————————————————————
+def check_tables() -> bool:
+    """
+    Compara las tablas con el cálculo directo nota a nota de antes.
+    """
+    ok = True
+    for s in SCALES:
+        sems = [NOTE_TO_SEMITONE[n] for n in SCALE_DEGREES[s]]
+        for n in range(-24, 152):
+            base = n % 12
+            ref  = n if base in sems else (n // 12) * 12 + min(sems, key=lambda x: abs(x - base))
+            ok  &= snap_to_scale(n, s) == ref
+            ok  &= int(snap_notes([n], [SCALE_INDEX[s]])[0]) == ref
+            if 0 <= n < 128:
+                ok &= int(SNAP_ARRAY[SCALE_INDEX[s], n]) == ref
+        for d in range(7):
+            root_pc  = sems[d]
+            root_5th = clamp_to_range(root_pc + 60)
+            ref = [clamp_to_range(root_pc + 36), clamp_to_range(root_pc + 48), root_5th]
+            ref += [clamp_to_range(root_5th + ((sems[(d + k) % 7] - root_pc) % 12))
+                    for k in (2, 4, 6)]
+            ok &= list(chord_voicing(s, d)) == ref[:5]
+            ok &= list(chord_voicing(s, d, True)) == ref
+    status = '✅' if ok else '❌'
+    print(f"{status} {len(SCALES)} escalas: ajuste de 128 notas y {len(SCALES) * 14} voicings")
+    return ok
+
+if __name__ == "__main__":
+    check_tables()
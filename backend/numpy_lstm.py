@@ -0,0 +1,240 @@
+# backend/numpy_lstm.py
+
+import json
+import sys
+
+import h5py
+import numpy as np
+
+# —————————————————————————————————————————————————————————————————————————
+# Motor de inferencia en NumPy para los modelos Sequential guardados en .h5
+# (LSTM → Dropout → LSTM → Dropout → Dense → Dense). Permite servir sin
+# importar TensorFlow.
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+ACTIVATIONS = {
+    'linear':       lambda x: x,
+    'relu':         lambda x: np.maximum(x, 0.0),
+    'tanh':         np.tanh,
+    'sigmoid':      _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+}
+
+def _activation(name: str):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Activación no soportada: {name}")
+    return ACTIVATIONS[name]
+
+# —————————————————————————————————————————————————————————————————————————
+class LSTMLayer:
+    def __init__(self, kernel, recurrent_kernel, bias, return_sequences,
+                 activation='tanh', recurrent_activation='sigmoid'):
+        self.kernel           = kernel
+        self.recurrent_kernel = recurrent_kernel
+        self.bias             = bias
+        self.units            = recurrent_kernel.shape[0]
+        self.return_sequences = return_sequences
+        self.act              = _activation(activation)
+        self.rec_act          = _activation(recurrent_activation)
+
+    def zero_state(self, n: int):
+        u = self.units
+        return np.zeros((n, u), dtype=np.float32), np.zeros((n, u), dtype=np.float32)
+
+    def cell(self, zx, h, c):
+        """
+        Un paso de la celda. zx = x_t @ kernel + bias ya calculado.
+        """
+        u = self.units
+        z = zx + h @ self.recurrent_kernel
+        # Orden de puertas de Keras: input, forget, cell, output
+        i = self.rec_act(z[:, :u])
+        f = self.rec_act(z[:, u:2*u])
+        g = self.act(z[:, 2*u:3*u])
+        o = self.rec_act(z[:, 3*u:])
+        c = f * c + i * g
+        h = o * self.act(c)
+        return h, c
+
+    def __call__(self, x):
+        n, steps, _ = x.shape
+        h, c = self.zero_state(n)
+        # Proyección de la entrada de todos los pasos de una vez
+        zx = x @ self.kernel + self.bias                  # (n, steps, 4u)
+        outputs = []
+        for t in range(steps):
+            h, c = self.cell(zx[:, t], h, c)
+            if self.return_sequences:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if self.return_sequences else h
+
+class DenseLayer:
+    def __init__(self, kernel, bias, activation='linear'):
+        self.kernel = kernel
+        self.bias   = bias
+        self.act    = _activation(activation)
+
+    def __call__(self, x):
+        return self.act(x @ self.kernel + self.bias)
+
+# —————————————————————————————————————————————————————————————————————————
+class NumpyMelodyModel:
+    """
+    Réplica de solo-inferencia del modelo Keras. Expone predict() con la
+    misma firma que tf.keras.Model para poder sustituirlo directamente.
+    """
+    def __init__(self, layers):
+        self.layers = layers
+
+    @classmethod
+    def from_h5(cls, path: str):
+        with h5py.File(path, 'r') as f:
+            config  = json.loads(f.attrs['model_config'])
+            weights = f['model_weights'] if 'model_weights' in f else f
+
+            layers = []
+            for layer in config['config']['layers']:
+                kind, cfg = layer['class_name'], layer['config']
+                if kind in ('InputLayer', 'Dropout'):
+                    continue
+                group = weights[cfg['name']]
+                w = [np.asarray(group[name], dtype=np.float32)
+                     for name in group.attrs['weight_names']]
+                if kind == 'LSTM':
+                    layers.append(LSTMLayer(
+                        w[0], w[1], w[2],
+                        return_sequences=cfg.get('return_sequences', False),
+                        activation=cfg.get('activation', 'tanh'),
+                        recurrent_activation=cfg.get('recurrent_activation', 'sigmoid'),
+                    ))
+                elif kind == 'Dense':
+                    layers.append(DenseLayer(w[0], w[1], cfg.get('activation', 'linear')))
+                else:
+                    raise ValueError(f"Capa no soportada: {kind}")
+        return cls(layers)
+
+    def predict(self, x, verbose=0):
+        out = np.asarray(x, dtype=np.float32)
+        for layer in self.layers:
+            out = layer(out)
+        return out
+
+    # ——— Decodificación incremental ———
+    # Los estados (h, c) de cada LSTM se conservan entre pasos, de modo que
+    # cada nota nueva cuesta un único paso temporal en lugar de 16.
+
+    def initial_state(self, n: int):
+        return [l.zero_state(n) for l in self.layers if isinstance(l, LSTMLayer)]
+
+    def step(self, x_t, states):
+        """
+        x_t: (n, 3). Devuelve (salida (n, 3), nuevos estados).
+        """
+        out = np.asarray(x_t, dtype=np.float32)
+        new_states, k = [], 0
+        for layer in self.layers:
+            if isinstance(layer, LSTMLayer):
+                h, c = layer.cell(out @ layer.kernel + layer.bias, *states[k])
+                new_states.append((h, c))
+                out, k = h, k + 1
+            else:
+                out = layer(out)
+        return out, new_states
+
+    def prime(self, x):
+        """
+        Consume una secuencia (n, steps, 3) paso a paso y devuelve la
+        predicción tras el último paso junto con los estados.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        states = self.initial_state(len(x))
+        for t in range(x.shape[1]):
+            out, states = self.step(x[:, t], states)
+        return out, states
+
+# —————————————————————————————————————————————————————————————————————————
+# Error absoluto máximo admitido entre el motor NumPy y TensorFlow
+TF_ATOL = 1e-4
+
+def compare_with_tensorflow(path: str, n: int = 256, atol: float = TF_ATOL) -> float:
+    """
+    Compara la salida del motor NumPy con la de TensorFlow sobre entradas
+    aleatorias y devuelve el error absoluto máximo. Lanza AssertionError
+    si supera atol.
+    """
+    import tensorflow as tf
+
+    x   = np.random.default_rng(0).random((n, 16, 3), dtype=np.float32)
+    ref = tf.keras.models.load_model(path).predict(x, verbose=0)
+    out = NumpyMelodyModel.from_h5(path).predict(x)
+    err = float(np.max(np.abs(ref - out)))
+    print(f"{path}: error máximo frente a TensorFlow {err:.2e} (tolerancia {atol:.0e})")
+    if err > atol:
+        raise AssertionError(f"{path}: el motor NumPy se separa de TensorFlow ({err:.2e} > {atol:.0e})")
+    return err
+
+# La decodificación incremental NO es equivalente a la de ventana: la
+# primera predicción coincide (mismo contexto de 16 pasos), pero después la
+# ventana descarta el paso más antiguo y el modo incremental conserva todo
+# el historial en sus estados. Desviación máxima admitida (en unidades
+# escaladas, 0..1) durante los 8 pasos de una melodía; con los modelos
+# actuales es de 0.06-0.10.
+PRIME_ATOL            = 1e-5
+INCREMENTAL_MAX_DRIFT = 0.15
+
+def decoding_drift(model, window, length: int = 8, reference=None) -> list:
+    """
+    Decodifica `length` pasos como generate_melody en modo 'window'
+    (realimentando cada predicción en la ventana) y, con las mismas
+    entradas, en modo incremental. Devuelve el error absoluto máximo de
+    cada paso; el paso 0 es la predicción sobre el contexto.
+    `reference` es el predict() de la ventana (por defecto, el del propio
+    modelo; p. ej. el de TensorFlow para compararlo con otro motor).
+    """
+    reference = reference or model.predict
+    window = np.asarray(window, dtype=np.float32)
+    ref = np.asarray(reference(window), dtype=np.float32)
+    out, states = model.prime(window)
+    drift = [float(np.max(np.abs(ref - out)))]
+    for _ in range(length - 1):
+        window = np.concatenate([window[:, 1:], ref[:, None]], axis=1)
+        out, states = model.step(ref, states)
+        ref = np.asarray(reference(window), dtype=np.float32)
+        drift.append(float(np.max(np.abs(ref - out))))
+    return drift
+
+def check_incremental_parity(path: str, n: int = 64, length: int = 8,
+                             atol: float = PRIME_ATOL,
+                             max_drift: float = INCREMENTAL_MAX_DRIFT) -> list:
+    """
+    Compara la decodificación incremental con la de ventana durante
+    `length` pasos: el primero debe coincidir (atol) y el resto no debe
+    separarse más de max_drift. Lanza AssertionError si no se cumple.
+    """
+    model  = NumpyMelodyModel.from_h5(path)
+    window = np.random.default_rng(0).random((n, 16, 3), dtype=np.float32)
+    drift  = decoding_drift(model, window, length)
+    print(f"{path}: primer paso {drift[0]:.2e}, desviación máxima tras "
+          f"{length} pasos {max(drift):.2e} (admitida {max_drift})")
+    if drift[0] > atol:
+        raise AssertionError(f"{path}: la primera predicción incremental no coincide ({drift[0]:.2e})")
+    if max(drift) > max_drift:
+        raise AssertionError(f"{path}: la decodificación incremental se separa {max(drift):.2e} > {max_drift}")
+    return drift
+
+if __name__ == "__main__":
+    # python -m backend.numpy_lstm modelo.h5 [...]; termina con código 1 si algo falla
+    failed = False
+    for model_path in sys.argv[1:]:
+        for check in (check_incremental_parity, compare_with_tensorflow):
+            try:
+                check(model_path)
+            except AssertionError as e:
+                print(f"❌ {e}")
+                failed = True
+    sys.exit(1 if failed else 0)
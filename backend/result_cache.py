@@ -0,0 +1,133 @@
+# backend/result_cache.py
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# —————————————————————————————————————————————————————————————————————————
+# Configuración (variables de entorno)
+RESULT_CACHE_MAX      = int(os.environ.get('RESULT_CACHE_MAX', '512'))
+RESULT_CACHE_DIR      = os.environ.get('RESULT_CACHE_DIR') or None
+RESULT_CACHE_DISK_MAX = int(os.environ.get('RESULT_CACHE_DISK_MAX', '10000'))
+
+# —————————————————————————————————————————————————————————————————————————
+def cache_key(scale: str, seed: int, version: str) -> str:
+    return hashlib.sha256(f"{scale}|{seed}|{version}".encode()).hexdigest()
+
+class ResultCache:
+    """
+    LRU de MIDIs generados con seed explícita, en memoria y opcionalmente
+    en disco (un archivo por clave, escrito de forma atómica).
+    aget/aput son para el bucle de eventos: la capa de disco va a un hilo.
+    """
+    def __init__(self, max_items: int = RESULT_CACHE_MAX,
+                 disk_dir: str = RESULT_CACHE_DIR,
+                 disk_max: int = RESULT_CACHE_DISK_MAX):
+        self.max_items = max_items
+        self.disk_dir  = disk_dir
+        self.disk_max  = disk_max
+        self._items    = OrderedDict()
+        self._disk     = OrderedDict()   # claves en disco, de la más antigua a la más reciente
+        self._lock     = threading.Lock()
+        self.hits      = 0
+        self.disk_hits = 0
+        self.misses    = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            # Único recorrido del directorio: después el recorte usa _disk
+            entries = [e for e in os.scandir(disk_dir) if e.name.endswith('.mid')]
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for e in entries:
+                self._disk[e.name[:-len('.mid')]] = None
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.mid")
+
+    def get(self, key: str):
+        data = self._from_memory(key)
+        if data is None and self.disk_dir:
+            data = self._from_disk(key)
+        if data is None:
+            self.misses += 1
+        return data
+
+    async def aget(self, key: str):
+        data = self._from_memory(key)
+        if data is None and self.disk_dir:
+            data = await asyncio.to_thread(self._from_disk, key)
+        if data is None:
+            self.misses += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        self._remember(key, data)
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    async def aput(self, key: str, data: bytes):
+        self._remember(key, data)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, data)
+
+    def _from_memory(self, key: str):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def _from_disk(self, key: str):
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                data = f.read()
+            # el mtime conserva el orden LRU entre reinicios
+            os.utime(self._disk_path(key))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._disk[key] = None
+            self._disk.move_to_end(key)
+        self._remember(key, data)
+        self.disk_hits += 1
+        return data
+
+    def _write_disk(self, key: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._disk_path(key))
+        with self._lock:
+            self._disk[key] = None
+            self._disk.move_to_end(key)
+            evicted = []
+            while len(self._disk) > self.disk_max:
+                evicted.append(self._disk.popitem(last=False)[0])
+        for old in evicted:
+            try:
+                os.remove(self._disk_path(old))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._items[key] = data
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            'items':      len(self._items),
+            'max_items':  self.max_items,
+            'hits':       self.hits,
+            'disk_hits':  self.disk_hits,
+            'misses':     self.misses,
+            'disk_dir':   self.disk_dir,
+            'disk_items': len(self._disk),
+        }
+
+result_cache = ResultCache()
@@ -0,0 +1,94 @@
+# backend/scaling.py
+
+import sys
+
+import numpy as np
+
+# —————————————————————————————————————————————————————————————————————————
+# Los MinMaxScaler del modelo son transformaciones afines por columna.
+# Se extraen sus coeficientes una vez y se aplican a lotes completos
+# (nota, duración, velocidad) con las mismas operaciones en el mismo orden
+# que sklearn, de modo que el resultado es idéntico bit a bit.
+
+class AffineScaling:
+    """
+    Coeficientes de los scalers de nota, duración y velocidad, apilados
+    como columnas de una matriz (n, 3).
+    """
+    def __init__(self, scale, min_, clip=None, feature_range=None):
+        # float64 y forma (3,), como scale_ y min_ en sklearn: así numpy
+        # elige el mismo bucle (float64) que inverse_transform/transform
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.min   = np.asarray(min_,  dtype=np.float64)
+        self.clip  = clip
+        self.feature_range = feature_range
+
+    @classmethod
+    def from_scalers(cls, *scalers):
+        for s in scalers:
+            if getattr(s, 'n_features_in_', 1) != 1:
+                raise ValueError("Se esperaba un scaler de una sola columna")
+        clips = [bool(getattr(s, 'clip', False)) for s in scalers]
+        clip  = np.array(clips) if any(clips) else None
+        feature_range = None
+        if clip is not None:
+            feature_range = (np.array([s.feature_range[0] for s in scalers], dtype=np.float64),
+                             np.array([s.feature_range[1] for s in scalers], dtype=np.float64))
+        return cls(
+            np.concatenate([s.scale_ for s in scalers]),
+            np.concatenate([s.min_ for s in scalers]),
+            clip, feature_range,
+        )
+
+    def inverse(self, x: np.ndarray) -> np.ndarray:
+        """
+        Equivale a inverse_transform columna a columna. Conserva el dtype
+        de x si es flotante (float32 para la salida del modelo).
+        """
+        x = np.array(x, copy=True)
+        if x.dtype.kind != 'f':
+            x = x.astype(np.float64)
+        x -= self.min
+        x /= self.scale
+        return x
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        """
+        Equivale a transform columna a columna (entrada entera → float64).
+        """
+        x = np.array(x, dtype=np.float64, copy=True)
+        x *= self.scale
+        x += self.min
+        if self.clip is not None:
+            lo, hi = self.feature_range
+            np.copyto(x, np.clip(x, lo, hi), where=self.clip)
+        return x
+
+# —————————————————————————————————————————————————————————————————————————
+def check_against_sklearn(scaler_paths, n: int = 10_000) -> bool:
+    """
+    Compara con los scalers originales sobre entradas aleatorias.
+    """
+    import pickle
+    scalers = []
+    for path in scaler_paths:
+        with open(path, 'rb') as f:
+            scalers.append(pickle.load(f))
+    scaling = AffineScaling.from_scalers(*scalers)
+    rng = np.random.default_rng(0)
+
+    preds = rng.random((n, 3), dtype=np.float32) * 1.5 - 0.25
+    ints  = rng.integers(-50, 2000, size=(n, 3))
+    ok_inv = np.array_equal(
+        scaling.inverse(preds),
+        np.hstack([s.inverse_transform(preds[:, [k]]) for k, s in enumerate(scalers)]))
+    ok_fwd = np.array_equal(
+        scaling.forward(ints),
+        np.hstack([s.transform(ints[:, [k]]) for k, s in enumerate(scalers)]))
+    status = '✅' if ok_inv and ok_fwd else '❌'
+    print(f"{status} {', '.join(scaler_paths)}: inversa {ok_inv}, directa {ok_fwd}")
+    return ok_inv and ok_fwd
+
+if __name__ == "__main__":
+    # python -m backend.scaling ai/note_scaler.pkl ai/duration_scaler.pkl ai/velocity_scaler.pkl
+    check_against_sklearn(sys.argv[1:])
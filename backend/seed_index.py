@@ -0,0 +1,62 @@
+# backend/seed_index.py
+
+import random
+from typing import Dict, List
+
+import numpy as np
+
+from ai.melody_dataset import MelodyDataset, load as load_dataset
+
+# —————————————————————————————————————————————————————————————————————————
+class SeedIndex:
+    """
+    Índice de semillas de un modo ('minor' o 'major').
+    Los eventos (note, duration, velocity) se guardan en un único array
+    compacto agrupado por escala de origen, junto con el desplazamiento
+    de transposición precalculado hacia las 12 tónicas posibles.
+    """
+    def __init__(self, dataset: MelodyDataset, mode: str, root_pc: Dict[str, int]):
+        suffix = 'MAJOR' if mode == 'major' else 'MINOR'
+        blocks, scales = [], []
+        for i, scale in enumerate(dataset.scales):
+            start, stop = int(dataset.offsets[i]), int(dataset.offsets[i + 1])
+            if not scale.endswith(suffix) or start == stop:
+                continue
+            blocks.append(dataset.events(start, stop))
+            scales.append(scale)
+
+        self.mode   = mode
+        self.scales = scales
+        self.events = (np.concatenate(blocks) if blocks
+                       else np.empty((0, 3), dtype=np.int32))
+
+        # Escala de origen de cada evento
+        sizes = [len(b) for b in blocks]
+        self.scale_of = np.repeat(np.arange(len(scales), dtype=np.int16), sizes)
+
+        # offsets[s, pc]: semitonos para llevar la escala s a la tónica pc
+        src = np.array([root_pc[s] for s in scales], dtype=np.int16)
+        diff = (np.arange(12, dtype=np.int16)[None, :] - src[:, None]) % 12
+        self.offsets = np.where(diff <= 6, diff, diff - 12).astype(np.int8)
+
+    @classmethod
+    def from_path(cls, path: str, mode: str, root_pc: Dict[str, int]):
+        """
+        Conjunto columnar (.cols) o JSON antiguo.
+        """
+        return cls(load_dataset(path), mode, root_pc)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def sample(self, target_pc: int, k: int = 3, rng=random) -> List[List[int]]:
+        """
+        Elige k eventos distintos al azar y los transpone a la tónica target_pc.
+        """
+        picks = rng.sample(range(len(self.events)), min(k, len(self.events)))
+        seed = []
+        for i in picks:
+            note, dur, vel = self.events[i]
+            offset = self.offsets[self.scale_of[i], target_pc]
+            seed.append([int(note) + int(offset), int(dur), int(vel)])
+        return seed
@@ -0,0 +1,285 @@
+# backend/worker_pool.py
+
+import asyncio
+import itertools
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# —————————————————————————————————————————————————————————————————————————
+# Configuración (variables de entorno)
+GENERATION_WORKERS     = int(os.environ.get('GENERATION_WORKERS', '2'))
+GENERATION_QUEUE_MAX   = int(os.environ.get('GENERATION_QUEUE_MAX', '32'))
+GENERATION_DEADLINE_S  = float(os.environ.get('GENERATION_DEADLINE_S', '30'))
+STREAM_POLL_S          = 0.25   # espera máxima de cada lectura de la cola de streams
+
+# —————————————————————————————————————————————————————————————————————————
+class QueueFull(Exception):
+    """La cola de generación está llena: hay que reintentar más tarde."""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Cola de generación llena, reintentar en {retry_after}s")
+        self.retry_after = retry_after
+
+class DeadlineExceeded(Exception):
+    """La petición superó su plazo mientras esperaba en la cola."""
+
+# —————————————————————————————————————————————————————————————————————————
+def _init_worker():
+    # Cada proceso carga modelos, scalers e índices una sola vez
+    from backend.generate_music import preload_pipelines
+    preload_pipelines()
+
+def _noop():
+    return None
+
+def _timed(fn, args, kwargs, deadline):
+    # Se descarta antes de la inferencia si ya venció el plazo en la cola
+    if deadline is not None and time.time() > deadline:
+        raise DeadlineExceeded("Plazo vencido antes de empezar la generación")
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+_STREAM_END = '__fin__'
+
+def _stream_into(fn, args, kwargs, out_queue, stream_id, stop, deadline):
+    # Ejecuta un generador en el proceso del pool y reenvía cada elemento,
+    # etiquetado con su stream, a la cola común; se detiene si el cliente
+    # se ha ido (stop)
+    try:
+        if deadline is not None and time.time() > deadline:
+            raise DeadlineExceeded("Plazo vencido antes de empezar la generación")
+        for item in fn(*args, **kwargs):
+            if stop.is_set():
+                return
+            out_queue.put((stream_id, item))
+    except Exception as e:
+        out_queue.put((stream_id, (_STREAM_END, e)))
+        raise
+    out_queue.put((stream_id, (_STREAM_END, None)))
+
+class GenerationPool:
+    """
+    Pool de procesos para la generación (inferencia + MIDI), de modo que
+    el bucle de eventos de uvicorn nunca se bloquea. Cada proceso ejecuta
+    una tarea cada vez; la agrupación de peticiones se hace antes de
+    despachar, en backend.batching.RequestBatcher.
+    La cola está acotada a `max_queue` peticiones en espera; cada petición
+    tiene un plazo y se descarta si vence antes de llegar a un proceso.
+    """
+    def __init__(self, workers: int = GENERATION_WORKERS,
+                 max_queue: int = GENERATION_QUEUE_MAX,
+                 deadline_s: float = GENERATION_DEADLINE_S):
+        self.workers      = workers
+        self.max_queue    = max_queue
+        self.deadline_s   = deadline_s
+        self._executor    = None
+        self._manager     = None
+        self._started_at  = None
+        self._stream_queue = None     # cola común de todos los stream()
+        self._channels     = {}       # stream → (bucle, asyncio.Queue)
+        self._stream_ids   = itertools.count()
+        self._reader       = None
+        self._closing      = threading.Event()
+        self.pending      = 0      # enviadas y aún sin terminar
+        self.completed    = 0
+        self.failed       = 0
+        self.rejected     = 0
+        self.expired      = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            # Arrancar ya todos los procesos para que precarguen los modelos
+            for _ in range(self.workers):
+                self._executor.submit(_noop)
+            self._started_at = time.monotonic()
+        if self._manager is None:
+            # Cola de stream(): se crea aquí y no en la primera petición
+            self._manager      = multiprocessing.get_context('spawn').Manager()
+            self._stream_queue = self._manager.Queue()
+            self._closing.clear()
+            self._reader = threading.Thread(target=self._read_streams, daemon=True)
+            self._reader.start()
+
+    def _read_streams(self):
+        # Un solo hilo lee la cola común y reparte cada elemento a la
+        # asyncio.Queue de su stream: los streams abiertos no ocupan hilos
+        # del executor por defecto (ni compiten con asyncio.to_thread)
+        out_queue = self._stream_queue
+        while not self._closing.is_set():
+            try:
+                stream_id, item = out_queue.get(True, STREAM_POLL_S)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break       # el Manager se ha cerrado
+            channel = self._channels.get(stream_id)
+            if channel is not None:
+                loop, items = channel
+                try:
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+                except RuntimeError:
+                    pass    # bucle cerrado: nadie espera ya este stream
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._closing.set()
+            self._reader.join()
+            self._manager.shutdown()
+            self._manager = None
+            self._stream_queue = None
+            self._reader = None
+
+    def queue_depth(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    def retry_after(self) -> int:
+        """
+        Estimación en segundos de cuándo se liberará la cola.
+        """
+        avg = self.busy_seconds / self.completed if self.completed else 1.0
+        return max(1, math.ceil(avg * (self.queue_depth() + 1) / self.workers))
+
+    async def run(self, fn, *args, deadline_s: float = None, **kwargs):
+        """
+        Ejecuta fn(*args, **kwargs) en un proceso del pool y espera su resultado.
+        fn debe ser una función de módulo (serializable con pickle).
+        Lanza QueueFull si la cola está llena y DeadlineExceeded si el plazo
+        vence antes de empezar.
+        """
+        self.start()
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        deadline   = time.time() + deadline_s if deadline_s > 0 else None
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            result, elapsed = await loop.run_in_executor(
+                self._executor, _timed, fn, args, kwargs, deadline
+            )
+        except DeadlineExceeded:
+            self.expired += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed    += 1
+        self.busy_seconds += elapsed
+        return result
+
+    async def stream(self, fn, *args, deadline_s: float = None, **kwargs):
+        """
+        Como run(), pero fn es un generador: cada elemento que produce en el
+        proceso del pool se entrega aquí en cuanto existe.
+        Los elementos llegan por la cola común y el hilo lector; la espera
+        tiene timeout: si el proceso muere sin avisar se propaga su error,
+        y si no empieza antes del plazo se lanza DeadlineExceeded. Si el
+        consumidor se va, la tarea se cancela (o se le pide parar si ya
+        corre) y la plaza se libera cuando termina.
+        """
+        self.start()
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        deadline   = time.time() + deadline_s if deadline_s > 0 else None
+        stop       = self._manager.Event()
+        stream_id  = next(self._stream_ids)
+        items      = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._channels[stream_id] = (loop, items)
+        self.pending += 1
+        start = time.perf_counter()
+        future = self._executor.submit(
+            _stream_into, fn, args, kwargs, self._stream_queue, stream_id, stop, deadline
+        )
+        task = asyncio.wrap_future(future, loop=loop)
+        task.add_done_callback(self._stream_done)
+        started  = False
+        drained  = False
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(items.get(), STREAM_POLL_S)
+                except asyncio.TimeoutError:
+                    if task.done():
+                        error = None if task.cancelled() else task.exception()
+                        if error is not None:
+                            raise error
+                        # una última espera por si el fin aún va de camino
+                        if drained:
+                            raise RuntimeError("La generación terminó sin marca de fin")
+                        drained = True
+                    elif not started and deadline is not None and time.time() > deadline:
+                        raise DeadlineExceeded("Plazo vencido antes de empezar la generación")
+                    continue
+                started = True
+                if isinstance(item, tuple) and item and item[0] == _STREAM_END:
+                    if item[1] is not None:
+                        raise item[1]
+                    break
+                yield item
+            await task
+        except DeadlineExceeded:
+            self.expired += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._channels.pop(stream_id, None)
+            if not task.done():
+                # sin empezar se cancela; en marcha para en el siguiente paso
+                stop.set()
+                future.cancel()
+        self.completed    += 1
+        self.busy_seconds += time.perf_counter() - start
+
+    def _stream_done(self, task):
+        # La plaza se libera cuando el proceso termina de verdad, no cuando
+        # el consumidor deja de leer; el error ya se propagó o no interesa
+        self.pending -= 1
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        running = min(self.pending, self.workers)
+        uptime  = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'workers':      self.workers,
+            'running':      running,
+            'queue_depth':  self.queue_depth(),
+            'max_queue':    self.max_queue,
+            'deadline_s':   self.deadline_s,
+            'completed':    self.completed,
+            'failed':       self.failed,
+            'rejected':     self.rejected,
+            'expired':      self.expired,
+            'avg_seconds':  round(self.busy_seconds / self.completed, 4)
+                            if self.completed else 0.0,
+            'retry_after':  self.retry_after(),
+            'utilization':  round(running / self.workers, 3) if self.workers else 0.0,
+            'busy_ratio':   round(self.busy_seconds / (uptime * self.workers), 3)
+                            if uptime and self.workers else 0.0,
+        }
+
+pool = GenerationPool()
@@ -0,0 +1,46 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+# Los módulos se importan como backend.x desde la raíz del repositorio
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Modelos entrenados: solo existen tras ejecutar los scripts de ai/
+TRAINED_MODELS = [
+    os.path.join(ROOT, 'ai', name)
+    for name in ('melody_model.h5', 'melody_model_happy.h5')
+    if os.path.exists(os.path.join(ROOT, 'ai', name))
+]
+
+@pytest.fixture(scope='session')
+def small_model_h5(tmp_path_factory):
+    """
+    Modelo .h5 con la arquitectura de los de producción (LSTM → Dropout →
+    LSTM → Dropout → Dense → Dense), más estrecho y con pesos aleatorios
+    fijos: permite comparar motores sin los modelos entrenados.
+    """
+    tf = pytest.importorskip('tensorflow')
+    from tensorflow.keras.layers import LSTM, Dropout, Dense
+    from tensorflow.keras.models import Sequential
+
+    tf.keras.utils.set_random_seed(0)
+    model = Sequential([
+        LSTM(32, input_shape=(16, 3), return_sequences=True),
+        Dropout(0.3),
+        LSTM(32),
+        Dropout(0.3),
+        Dense(16, activation='relu'),
+        Dense(3, activation='linear'),
+    ])
+    path = str(tmp_path_factory.mktemp('modelos') / 'melody_model.h5')
+    model.save(path)
+    return path
+
+@pytest.fixture(params=['small'] + TRAINED_MODELS,
+                ids=lambda p: os.path.basename(p))
+def model_h5(request, small_model_h5):
+    return small_model_h5 if request.param == 'small' else request.param
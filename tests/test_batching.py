@@ -0,0 +1,49 @@
+# tests/test_batching.py
+
+import asyncio
+
+from backend.batching import RequestBatcher
+from backend.worker_pool import QueueFull
+
+class FakePool:
+    """
+    Sustituto del pool: devuelve la escala como MIDI y falla cualquier
+    lote que contenga una escala de `broken`.
+    """
+    def __init__(self, broken=(), error=None):
+        self.broken = set(broken)
+        self.error  = error
+        self.calls  = []
+
+    async def run(self, fn, scales):
+        self.calls.append(list(scales))
+        if self.error is not None:
+            raise self.error
+        bad = self.broken.intersection(scales)
+        if bad:
+            raise KeyError(bad.pop())
+        return [s.encode() for s in scales]
+
+async def gather_scales(batcher, scales):
+    return await asyncio.gather(*(batcher.generate(s) for s in scales), return_exceptions=True)
+
+def test_groups_requests_of_the_same_mode():
+    pool    = FakePool()
+    batcher = RequestBatcher(pool, wait_ms=20)
+    out = asyncio.run(gather_scales(batcher, ['CMINOR', 'DMINOR', 'EMAJOR']))
+    assert out == [b'CMINOR', b'DMINOR', b'EMAJOR']
+    assert sorted(map(sorted, pool.calls)) == [['CMINOR', 'DMINOR'], ['EMAJOR']]
+
+def test_failing_scale_does_not_fail_the_batch():
+    pool    = FakePool(broken={'HMINOR'})
+    batcher = RequestBatcher(pool, wait_ms=20)
+    out = asyncio.run(gather_scales(batcher, ['CMINOR', 'DMINOR', 'HMINOR', 'EMINOR']))
+    assert out[0] == b'CMINOR' and out[1] == b'DMINOR' and out[3] == b'EMINOR'
+    assert isinstance(out[2], KeyError)
+
+def test_capacity_errors_are_not_retried():
+    pool    = FakePool(error=QueueFull(3))
+    batcher = RequestBatcher(pool, wait_ms=20)
+    out = asyncio.run(gather_scales(batcher, ['CMINOR', 'DMINOR']))
+    assert all(isinstance(e, QueueFull) for e in out)
+    assert len(pool.calls) == 1
@@ -0,0 +1,53 @@
+# tests/test_db.py
+
+import sqlite3
+import threading
+import time
+
+from backend import db
+from backend.db import DbWriter
+
+def make_db(tmp_path):
+    path = str(tmp_path / 'test.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    return path
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute("SELECT id FROM t ORDER BY id")]
+    finally:
+        conn.close()
+
+def test_failing_statement_does_not_drop_the_batch(tmp_path):
+    path   = make_db(tmp_path)
+    writer = DbWriter(path)
+    for i in range(10):
+        # la fila 5 viola NOT NULL: solo esa debe perderse
+        writer.submit("INSERT INTO t (id, v) VALUES (?, ?)", (i, None if i == 5 else 'x'))
+    writer.flush()
+    assert rows(path) == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+    assert writer.failed == 1
+
+def test_locked_database_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'DB_BUSY_TIMEOUT_S', 0.2)
+    path = make_db(tmp_path)
+    lock = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    lock.execute("BEGIN EXCLUSIVE")
+
+    # el bloqueo dura más que el busy timeout, pero menos que los reintentos
+    release = threading.Timer(0.5, lambda: lock.execute("COMMIT"))
+    release.start()
+    writer = DbWriter(path)
+    start  = time.monotonic()
+    for i in range(3):
+        writer.submit("INSERT INTO t (id, v) VALUES (?, ?)", (i, 'x'))
+    writer.flush()
+    release.join()
+    lock.close()
+    assert rows(path) == [0, 1, 2]
+    assert writer.failed == 0
+    assert time.monotonic() - start >= 0.4
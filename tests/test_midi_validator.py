@@ -0,0 +1,68 @@
+# tests/test_midi_validator.py
+
+import struct
+
+import pytest
+
+from backend.midi_validator import MidiStreamValidator, InvalidMidi, MidiTooLarge
+
+def header(fmt=1, ntrks=1, division=384):
+    return b'MThd' + struct.pack('>IHHH', 6, fmt, ntrks, division)
+
+def track(events=b'\x00\xff\x2f\x00'):
+    return b'MTrk' + struct.pack('>I', len(events)) + events
+
+def midi(ntrks=1):
+    return header(ntrks=ntrks) + track() * ntrks
+
+def feed_all(data, chunk=None, max_bytes=None):
+    validator = MidiStreamValidator(max_bytes)
+    chunk = chunk or len(data) or 1
+    for i in range(0, len(data), chunk):
+        validator.feed(data[i:i + chunk])
+    validator.close()
+    return validator
+
+def test_valid_file_byte_by_byte():
+    v = feed_all(midi(ntrks=2), chunk=1)
+    assert (v.format, v.ntrks, v.tracks, v.division) == (1, 2, 2, 384)
+
+@pytest.mark.parametrize('cut', [1, 3, 5, 13, 14, 17])
+def test_header_split_across_chunks(cut):
+    data = midi()
+    v = MidiStreamValidator()
+    v.feed(data[:cut])
+    v.feed(data[cut:])
+    v.close()
+    assert v.tracks == 1
+
+def test_rejects_non_mthd_prefix_at_once():
+    v = MidiStreamValidator()
+    with pytest.raises(InvalidMidi, match='MThd'):
+        v.feed(b'RIFF')
+    # el primer byte ya basta para rechazarlo
+    with pytest.raises(InvalidMidi, match='MThd'):
+        MidiStreamValidator().feed(b'X')
+
+def test_rejects_truncated_track():
+    with pytest.raises(InvalidMidi, match='truncado'):
+        feed_all(midi()[:-2])
+
+def test_rejects_more_tracks_than_declared():
+    with pytest.raises(InvalidMidi, match='más pistas'):
+        feed_all(header(ntrks=1) + track() + track())
+
+def test_rejects_missing_tracks():
+    with pytest.raises(InvalidMidi, match='pistas'):
+        feed_all(header(ntrks=2) + track())
+
+def test_declared_chunk_over_limit_fails_before_its_data():
+    v = MidiStreamValidator(max_bytes=1000)
+    # solo llega la cabecera del chunk: se rechaza sin esperar sus datos
+    with pytest.raises(MidiTooLarge):
+        v.feed(header() + b'MTrk' + struct.pack('>I', 5000))
+
+def test_total_size_over_limit():
+    data = header() + track(b'\x00' * 200)
+    with pytest.raises(MidiTooLarge):
+        feed_all(data, chunk=16, max_bytes=100)
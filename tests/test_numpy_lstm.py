@@ -0,0 +1,56 @@
+# tests/test_numpy_lstm.py
+
+import os
+import random
+import shutil
+
+import numpy as np
+import pytest
+
+from backend import generate_music
+from backend.model_registry import ModelRegistry, PIPELINE_FILES, AI_DIR
+from backend.numpy_lstm import (
+    NumpyMelodyModel, compare_with_tensorflow, decoding_drift,
+    TF_ATOL, INCREMENTAL_MAX_DRIFT
+)
+
+def test_matches_tensorflow(model_h5):
+    # El motor NumPy reproduce el .h5 de Keras dentro de TF_ATOL
+    pytest.importorskip('tensorflow')
+    assert compare_with_tensorflow(model_h5) <= TF_ATOL
+
+# —————————————————————————————————————————————————————————————————————————
+# Decodificación incremental frente a la de ventana (no son equivalentes:
+# ver INCREMENTAL_MAX_DRIFT)
+
+def test_incremental_decoding_against_tensorflow_window(model_h5):
+    # Referencia independiente: la ventana de 16 pasos la evalúa TensorFlow
+    tf = pytest.importorskip('tensorflow')
+    reference = tf.keras.models.load_model(model_h5)
+    window = np.random.default_rng(0).random((32, 16, 3), dtype=np.float32)
+    drift = decoding_drift(NumpyMelodyModel.from_h5(model_h5), window, length=8,
+                           reference=lambda x: reference.predict(x, verbose=0))
+    assert drift[0] <= TF_ATOL
+    assert max(drift) <= INCREMENTAL_MAX_DRIFT
+
+def test_incremental_first_step_in_generate_path(tmp_path, monkeypatch, small_model_h5):
+    # A través de iter_melody_steps: con la misma seed, la primera nota de
+    # ambas decodificaciones es la misma
+    for mode in PIPELINE_FILES.values():
+        for key, name in mode.items():
+            src = small_model_h5 if key == 'model' else os.path.join(AI_DIR, name)
+            copy = shutil.copytree if os.path.isdir(src) else shutil.copy
+            copy(src, tmp_path / name)
+    monkeypatch.setattr(generate_music, 'registry', ModelRegistry(str(tmp_path), backend='numpy'))
+    generate_music.load_seed_index.cache_clear()
+
+    first = {}
+    for decoding in ('window', 'incremental'):
+        monkeypatch.setattr(generate_music, 'DECODING', decoding)
+        for scale in ('AMINOR', 'CMAJOR'):
+            steps = list(generate_music.iter_melody_steps([scale] * 4, 8, random.Random(7)))
+            assert len(steps) == 8
+            first[decoding, scale] = steps[0]
+    generate_music.load_seed_index.cache_clear()
+    for scale in ('AMINOR', 'CMAJOR'):
+        assert first['window', scale] == first['incremental', scale]
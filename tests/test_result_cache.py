@@ -0,0 +1,25 @@
+# tests/test_result_cache.py
+
+import asyncio
+import os
+
+from backend.result_cache import ResultCache
+
+def test_disk_layer_survives_restart(tmp_path):
+    cache = ResultCache(max_items=2, disk_dir=str(tmp_path), disk_max=10)
+    asyncio.run(cache.aput('a', b'A'))
+    again = ResultCache(max_items=2, disk_dir=str(tmp_path), disk_max=10)
+    assert asyncio.run(again.aget('a')) == b'A'
+    assert again.disk_hits == 1
+    assert asyncio.run(again.aget('b')) is None
+    assert again.misses == 1
+
+def test_disk_trim_keeps_most_recent(tmp_path):
+    cache = ResultCache(max_items=1, disk_dir=str(tmp_path), disk_max=3)
+    for key in 'abcd':
+        asyncio.run(cache.aput(key, key.encode()))
+    # 'a' es la más antigua; leer 'b' la vuelve la más reciente
+    assert asyncio.run(cache.aget('b')) == b'b'
+    asyncio.run(cache.aput('e', b'e'))
+    assert sorted(os.listdir(tmp_path)) == ['b.mid', 'd.mid', 'e.mid']
+    assert cache.stats()['disk_items'] == 3
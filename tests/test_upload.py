@@ -0,0 +1,97 @@
+# tests/test_upload.py
+
+import os
+
+import pytest
+
+from test_midi_validator import header, track, midi
+
+BOUNDARY = 'limite'
+
+def multipart(*parts):
+    """
+    Cuerpo multipart/form-data a partir de (campo, filename, datos).
+    """
+    body = b''
+    for name, filename, data in parts:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; '
+                 f'filename="{filename}"\r\n\r\n').encode() + data + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+def in_pieces(body, size=100):
+    # Sin Content-Length: el límite se tiene que aplicar leyendo
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend import db
+    # init_db() se ejecuta al importar la app: nunca sobre el users.db real
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'users.db'))
+    from backend import app as app_module
+    from backend.auth import get_current_user
+
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    registered = []
+    monkeypatch.setattr(app_module, 'UPLOAD_DIR', str(uploads))
+    monkeypatch.setattr(app_module, 'UPLOAD_MAX_BYTES', 1000)
+    monkeypatch.setattr(app_module, 'UPLOAD_MAX_BODY', 2000)
+    monkeypatch.setattr(app_module.catalog, 'register_file', lambda *args: registered.append(args))
+    app_module.app.dependency_overrides[get_current_user] = lambda: 'tester'
+    # sin `with`: no arranca el lifespan (pool de procesos, reserva...)
+    yield TestClient(app_module.app), uploads, registered
+    app_module.app.dependency_overrides.clear()
+
+def post(client, body):
+    return client.post('/melodias/upload', content=body,
+                       headers={'Content-Type': f'multipart/form-data; boundary={BOUNDARY}'})
+
+def leftovers(uploads):
+    return [n for n in os.listdir(uploads) if n.startswith('tmp_')]
+
+def test_valid_upload(client):
+    c, uploads, registered = client
+    data = midi(ntrks=2)
+    r = post(c, in_pieces(multipart(('titulo', 'x.txt', b'otro campo'), ('file', 'nueva.mid', data))))
+    assert r.status_code == 201
+    assert (uploads / 'nueva.mid').read_bytes() == data
+    assert [args[:2] for args in registered] == [('nueva.mid', str(uploads / 'nueva.mid'))]
+    assert leftovers(uploads) == []
+
+@pytest.mark.parametrize('filename, data, status', [
+    ('nueva.txt', midi(), 400),                         # extensión
+    ('nueva.mid', b'RIFF' + midi()[4:], 400),           # sin MThd
+    ('nueva.mid', midi()[:-2], 400),                    # pista truncada
+    ('nueva.mid', header(ntrks=1) + track() * 2, 400),  # más pistas de las declaradas
+    ('nueva.mid', header() + track(b'\x00' * 1200), 413),
+])
+def test_rejected_upload_leaves_nothing(client, filename, data, status):
+    c, uploads, registered = client
+    r = post(c, in_pieces(multipart(('file', filename, data))))
+    assert r.status_code == status
+    assert os.listdir(uploads) == []
+    assert registered == []
+
+def test_missing_file_part(client):
+    c, uploads, _ = client
+    r = post(c, multipart(('otro', 'nueva.mid', midi())))
+    assert r.status_code == 400
+    assert os.listdir(uploads) == []
+
+@pytest.mark.parametrize('streamed', [True, False])
+def test_body_over_limit(client, streamed):
+    c, uploads, _ = client
+    # el archivo es válido y cabe, pero otra parte hace el cuerpo demasiado grande
+    body = multipart(('relleno', 'r.bin', b'\x00' * 3000), ('file', 'nueva.mid', midi()))
+    r = post(c, in_pieces(body) if streamed else body)
+    assert r.status_code == 413
+    assert leftovers(uploads) == []
+    assert not (uploads / 'nueva.mid').exists()
+
+def test_not_multipart(client):
+    c, uploads, _ = client
+    r = c.post('/melodias/upload', json={'file': 'nueva.mid'})
+    assert r.status_code == 400
+    assert os.listdir(uploads) == []